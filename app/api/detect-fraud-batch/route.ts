@@ -5,6 +5,7 @@ interface TransactionInput {
   type: string
   origin_country: string
   dest_country: string
+  dest_user?: string
   hour: string
   day_of_week: string
   origin_balance: string
@@ -28,8 +29,10 @@ function engineerFeatures(transaction: TransactionInput) {
     balance_ratio_dest: amount / (destBalance + 1),
     is_cross_border: transaction.origin_country !== transaction.dest_country ? 1 : 0,
     is_night: hour >= 22 || hour <= 5 ? 1 : 0,
-    is_weekend: dayOfWeek === 0 || dayOfWeek === 6 ? 1 : 0,
-    is_merchant_dest: transaction.dest_country.includes("MERCHANT") ? 1 : 0,
+    // day_of_week follows pandas (Monday = 0), as in training
+    is_weekend: dayOfWeek === 5 || dayOfWeek === 6 ? 1 : 0,
+    // Optional destination account id (MERCHANT_... / USER_...)
+    is_merchant_dest: transaction.dest_user?.includes("MERCHANT") ? 1 : 0,
     user_transaction_count: userTxnCount,
     hour: hour,
     day_of_week: dayOfWeek,
@@ -1,10 +1,12 @@
 import { NextResponse } from "next/server"
+import { exportedRiskFactors, loadExportedModel, scoreExportedModel } from "@/lib/model-export"
 
 interface TransactionInput {
   amount: string
   type: string
   origin_country: string
   dest_country: string
+  dest_user?: string
   hour: string
   day_of_week: string
   origin_balance: string
@@ -24,6 +26,9 @@ interface FraudDetectionResult {
 }
 
 function engineerFeatures(transaction: TransactionInput) {
+  const exportedModel = loadExportedModel()
+  const amountMean = exportedModel?.header.feature_stats.amount_mean ?? 500
+  const amountStd = exportedModel?.header.feature_stats.amount_std ?? 1000
   const amount = Number.parseFloat(transaction.amount)
   const originBalance = Number.parseFloat(transaction.origin_balance)
   const destBalance = Number.parseFloat(transaction.dest_balance)
@@ -32,14 +37,17 @@ function engineerFeatures(transaction: TransactionInput) {
   const userTxnCount = Number.parseInt(transaction.user_transaction_count)
 
   return {
+    amount: amount,
     amount_log: Math.log1p(amount),
-    amount_zscore: (amount - 500) / 1000, // Simplified z-score
+    amount_zscore: (amount - amountMean) / amountStd, // Training statistics when a model export is present
     balance_ratio_origin: amount / (originBalance + 1),
     balance_ratio_dest: amount / (destBalance + 1),
     is_cross_border: transaction.origin_country !== transaction.dest_country ? 1 : 0,
     is_night: hour >= 22 || hour <= 5 ? 1 : 0,
-    is_weekend: dayOfWeek === 0 || dayOfWeek === 6 ? 1 : 0,
-    is_merchant_dest: transaction.dest_country.includes("MERCHANT") ? 1 : 0,
+    // day_of_week follows pandas (Monday = 0), as in training
+    is_weekend: dayOfWeek === 5 || dayOfWeek === 6 ? 1 : 0,
+    // Optional destination account id (MERCHANT_... / USER_...)
+    is_merchant_dest: transaction.dest_user?.includes("MERCHANT") ? 1 : 0,
     user_transaction_count: userTxnCount,
     hour: hour,
     day_of_week: dayOfWeek,
@@ -55,6 +63,18 @@ function engineerFeatures(transaction: TransactionInput) {
 function predictFraud(features: any): FraudDetectionResult {
   const startTime = Date.now()
 
+  // Score with the exported tree model when train_ml_models.py has produced one
+  const exportedModel = loadExportedModel()
+  if (exportedModel) {
+    const { probability, contributions } = scoreExportedModel(exportedModel, features)
+    return buildResult(
+      probability,
+      { [exportedModel.header.model_name]: probability },
+      exportedRiskFactors(exportedModel, contributions),
+      startTime,
+    )
+  }
+
   // Simulate model predictions based on engineered features
   const riskFactors = []
 
@@ -119,6 +139,15 @@ function predictFraud(features: any): FraudDetectionResult {
     riskFactors.push("Cash-out transaction type")
   }
 
+  return buildResult(fraudProb, modelPredictions, riskFactors, startTime)
+}
+
+function buildResult(
+  fraudProb: number,
+  modelPredictions: Record<string, number>,
+  riskFactors: string[],
+  startTime: number,
+): FraudDetectionResult {
   const confidence = 0.85
 
   const isFraud = fraudProb > 0.5
@@ -317,7 +317,7 @@ export default function FraudDetectionPage() {
                     </div>
 
                     <div>
-                      <Label htmlFor="day_of_week">Day of Week (0-6)</Label>
+                      <Label htmlFor="day_of_week">Day of Week (0 = Monday)</Label>
                       <Input
                         id="day_of_week"
                         type="number"
@@ -0,0 +1,155 @@
+import { readFileSync } from "fs"
+import path from "path"
+
+interface ArraySpec {
+  dtype: "int32" | "float32" | "float64"
+  offset: number
+  length: number
+}
+
+export interface ModelExportHeader {
+  format_version: number
+  timestamp: string
+  model_name: string
+  model_type: string
+  output: "probability" | "log_odds"
+  init_output: number
+  n_trees: number
+  max_depth: number
+  expected_value: number
+  feature_names: string[]
+  scale_features: boolean
+  scaler: { mean: number[]; scale: number[] }
+  feature_stats: { amount_mean?: number; amount_std?: number }
+  risk_factor_labels: Record<string, string>
+  arrays: Record<string, ArraySpec>
+}
+
+export interface ExportedModel {
+  header: ModelExportHeader
+  feature: Int32Array
+  threshold: Float64Array
+  left: Int32Array
+  right: Int32Array
+  value: Float64Array
+  roots: Int32Array
+}
+
+export interface ExportedModelScore {
+  probability: number
+  contributions: Record<string, number>
+}
+
+// Written by scripts/train_ml_models.py (export_tree_model)
+const EXPORT_PREFIX = path.join(process.env.MODEL_EXPORT_DIR ?? process.cwd(), "model_export_latest")
+
+// Column prefixes of the account graph features (scripts/graph_features.py)
+const GRAPH_FEATURE_PREFIXES = ["origin_graph_", "dest_graph_"]
+
+let cachedModel: ExportedModel | null | undefined
+
+function view(buffer: ArrayBuffer, spec: ArraySpec) {
+  switch (spec.dtype) {
+    case "int32":
+      return new Int32Array(buffer, spec.offset, spec.length)
+    case "float32":
+      return new Float32Array(buffer, spec.offset, spec.length)
+    case "float64":
+      return new Float64Array(buffer, spec.offset, spec.length)
+  }
+}
+
+// Loads the exported model once per server process; null when no export exists
+export function loadExportedModel(): ExportedModel | null {
+  if (cachedModel !== undefined) return cachedModel
+
+  try {
+    const header: ModelExportHeader = JSON.parse(readFileSync(`${EXPORT_PREFIX}.json`, "utf-8"))
+    // Account graph features are not built per request and would silently score as 0
+    const graphFeatures = header.feature_names.filter((name) => GRAPH_FEATURE_PREFIXES.some((p) => name.startsWith(p)))
+    if (graphFeatures.length > 0) {
+      console.warn(`Ignoring ${EXPORT_PREFIX}: graph features are not available per request (${graphFeatures.join(", ")})`)
+      cachedModel = null
+      return cachedModel
+    }
+    const file = readFileSync(`${EXPORT_PREFIX}.bin`)
+    // Copy into a standalone ArrayBuffer so the 8-byte aligned offsets hold
+    const buffer = file.buffer.slice(file.byteOffset, file.byteOffset + file.byteLength)
+    const arrays = header.arrays
+
+    cachedModel = {
+      header,
+      feature: view(buffer, arrays.feature) as Int32Array,
+      threshold: view(buffer, arrays.threshold) as Float64Array,
+      left: view(buffer, arrays.left) as Int32Array,
+      right: view(buffer, arrays.right) as Int32Array,
+      value: view(buffer, arrays.value) as Float64Array,
+      roots: view(buffer, arrays.roots) as Int32Array,
+    }
+  } catch {
+    cachedModel = null
+  }
+
+  return cachedModel
+}
+
+// Same steps as score_exported_model in scripts/verify_model_export.py
+export function scoreExportedModel(model: ExportedModel, features: Record<string, number>): ExportedModelScore {
+  const { header } = model
+  const nFeatures = header.feature_names.length
+
+  const x = new Float64Array(nFeatures)
+  for (let i = 0; i < nFeatures; i++) {
+    let value = features[header.feature_names[i]] ?? 0
+    if (header.scale_features) {
+      value = (value - header.scaler.mean[i]) / header.scaler.scale[i]
+    }
+    // sklearn compares float32 inputs against float64 thresholds
+    x[i] = Math.fround(value)
+  }
+
+  // Every split on the path credits the change in node value to its feature
+  // (TreeExplainer._path_contributions in scripts/tree_explainer.py)
+  const contributions = new Float64Array(nFeatures)
+  let output = header.init_output
+  for (let t = 0; t < model.roots.length; t++) {
+    let node = model.roots[t]
+    while (model.left[node] !== node) {
+      const child = x[model.feature[node]] <= model.threshold[node] ? model.left[node] : model.right[node]
+      contributions[model.feature[node]] += model.value[child] - model.value[node]
+      node = child
+    }
+
+    output += model.value[node]
+  }
+
+  const probability = header.output === "log_odds" ? 1 / (1 + Math.exp(-output)) : output
+
+  const contributionsByFeature: Record<string, number> = {}
+  header.feature_names.forEach((name, i) => {
+    contributionsByFeature[name] = contributions[i]
+  })
+
+  return { probability, contributions: contributionsByFeature }
+}
+
+// Groups contributions into human-readable risk factors (see scripts/tree_explainer.py)
+export function exportedRiskFactors(
+  model: ExportedModel,
+  contributions: Record<string, number>,
+  maxFactors = 5,
+  minContribution = 0.01,
+): string[] {
+  const factorScores: Record<string, number> = {}
+
+  for (const [feature, contribution] of Object.entries(contributions)) {
+    const label = model.header.risk_factor_labels[feature] ?? feature
+    factorScores[label] = (factorScores[label] ?? 0) + contribution
+  }
+
+  return Object.entries(factorScores)
+    .filter(([, score]) => score >= minContribution)
+    .sort((a, b) => b[1] - a[1])
+    .slice(0, maxFactors)
+    .map(([label]) => label)
+}
@@ -0,0 +1,310 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import glob
+import time
+import uuid
+import argparse
+import joblib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from generate_transaction_data import engineer_features
+from drift_monitor import DriftMonitor, load_drift_reference, print_drift_report
+from graph_features import GRAPH_FEATURE_PREFIXES
+
+# Decision thresholds (kept in line with app/api/detect-fraud/route.ts)
+RECOMMENDATIONS = [
+    (0.8, "Block transaction immediately and flag for investigation"),
+    (0.6, "Require additional verification before processing"),
+    (0.4, "Monitor transaction and user activity closely"),
+]
+DEFAULT_RECOMMENDATION = "Process transaction normally"
+
+# Per-worker state, populated once by the pool initializer
+_worker_state = {}
+
+def load_scoring_config(model_name=None):
+    """Load feature vocabulary, feature statistics and the model to score with"""
+    try:
+        with open('feature_names.json', 'r') as f:
+            feature_names = json.load(f)
+
+        with open('model_metadata_latest.json', 'r') as f:
+            metadata = json.load(f)
+    except FileNotFoundError:
+        print("Model artifacts not found. Please run train_ml_models.py first.")
+        return None
+
+    try:
+        with open('feature_stats.json', 'r') as f:
+            feature_stats = json.load(f)
+    except FileNotFoundError:
+        feature_stats = {}
+
+    return {
+        'feature_names': feature_names,
+        'feature_stats': feature_stats,
+        'model_name': model_name or metadata['best_model'],
+        'model_timestamp': metadata.get('timestamp')
+    }
+
+def collect_input_statistics(input_path, chunk_size, feature_stats):
+    """
+    First pass over the input: count rows and gather the dataset-level
+    statistics engineer_features needs, so every shard sees the same values.
+    """
+    n_rows = 0
+    user_counts = pd.Series(dtype='int64')
+    amount_sum = 0.0
+    amount_sq_sum = 0.0
+
+    for chunk in pd.read_csv(input_path, usecols=['origin_user', 'amount'], chunksize=chunk_size):
+        n_rows += len(chunk)
+        user_counts = user_counts.add(chunk['origin_user'].value_counts(), fill_value=0)
+        amount_sum += chunk['amount'].sum()
+        amount_sq_sum += (chunk['amount'] ** 2).sum()
+
+    stats = dict(feature_stats)
+    stats['user_counts'] = user_counts.astype('int64').to_dict()
+
+    # Fall back to input statistics when no training statistics were saved
+    if 'amount_mean' not in stats and n_rows > 1:
+        mean = amount_sum / n_rows
+        stats['amount_mean'] = mean
+        stats['amount_std'] = np.sqrt((amount_sq_sum - n_rows * mean ** 2) / (n_rows - 1))
+
+    return n_rows, stats
+
+def make_decisions(fraud_probability, threshold=0.5):
+    """Turn fraud probabilities into labels, risk scores and recommendations"""
+    conditions = [fraud_probability > cutoff for cutoff, _ in RECOMMENDATIONS]
+    choices = [text for _, text in RECOMMENDATIONS]
+
+    return pd.DataFrame({
+        'fraud_probability': fraud_probability,
+        'is_fraud_predicted': fraud_probability > threshold,
+        'risk_score': np.round(fraud_probability * 100).astype(int),
+        'recommendation': np.select(conditions, choices, default=DEFAULT_RECOMMENDATION)
+    })
+
+def _init_worker(model_name, feature_names, feature_stats, threshold, drift_reference=None,
+                 drift_dir=None, drift_window_seconds=86400, drift_windows=30):
+    """Load the model once per worker process"""
+    # Memory-map the model arrays so workers share pages instead of copies
+    trained_models = joblib.load('trained_models_latest.pkl', mmap_mode='r')
+    model_info = trained_models[model_name]
+
+    _worker_state['model'] = model_info['model']
+    _worker_state['scaler'] = joblib.load('scaler_latest.pkl') if model_info['scale_features'] else None
+    _worker_state['feature_names'] = feature_names
+    _worker_state['feature_stats'] = feature_stats
+    _worker_state['threshold'] = threshold
+
+    # One drift monitor per worker, saved after every shard and merged by the parent
+    _worker_state['drift_monitor'] = None
+    if drift_reference is not None:
+        _worker_state['drift_monitor'] = DriftMonitor(drift_reference, drift_window_seconds, drift_windows)
+        _worker_state['drift_path'] = os.path.join(drift_dir, f'drift_worker_{uuid.uuid4().hex}.pkl')
+
+def score_shard(shard_id, shard_df, output_path, output_format):
+    """Engineer features, score and write one shard; returns (shard_id, rows, seconds)"""
+    start_time = time.time()
+
+    df_features = engineer_features(shard_df, _worker_state['feature_stats'])
+    X = df_features.reindex(columns=_worker_state['feature_names'], fill_value=0).fillna(0)
+    X = X.astype(float)
+    X_features = X
+
+    if _worker_state['scaler'] is not None:
+        X = _worker_state['scaler'].transform(X)
+
+    fraud_probability = _worker_state['model'].predict_proba(X)[:, 1]
+
+    monitor = _worker_state['drift_monitor']
+    if monitor is not None:
+        timestamps = shard_df['timestamp'].values if 'timestamp' in shard_df.columns else None
+        monitor.update(X_features, fraud_probability, timestamps)
+
+    results = make_decisions(fraud_probability, _worker_state['threshold'])
+    results.insert(0, 'transaction_id', shard_df['transaction_id'].values)
+
+    # Write to a temporary file first so a crash never leaves a partial shard
+    tmp_path = output_path + '.tmp'
+    if output_format == 'parquet':
+        results.to_parquet(tmp_path, index=False)
+    else:
+        results.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+
+    # Saved after the shard, so a crash in between under-counts rather than double-counts
+    if monitor is not None:
+        drift_path = _worker_state['drift_path']
+        monitor.save(drift_path + '.tmp')
+        os.replace(drift_path + '.tmp', drift_path)
+
+    return shard_id, len(shard_df), time.time() - start_time
+
+def merge_drift_monitors(drift_dir, reference, window_seconds, n_windows):
+    """Merge the per-worker drift monitors of this and any resumed run"""
+    monitor = DriftMonitor(reference, window_seconds, n_windows)
+    for path in sorted(glob.glob(os.path.join(drift_dir, 'drift_worker_*.pkl'))):
+        monitor.merge(DriftMonitor.load(path))
+    return monitor
+
+def load_manifest(output_dir):
+    """Load the scoring manifest of a previous (possibly interrupted) run"""
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+def run_batch_scoring(input_path, output_dir, model_name=None, shard_size=100000,
+                      n_workers=None, threshold=0.5, output_format='parquet', drift=True,
+                      drift_window_seconds=86400, drift_windows=30):
+    """Score a large transaction file in shards across worker processes
+
+    With drift enabled, every worker keeps a DriftMonitor over the features
+    and scores it produced; the monitors are merged into a drift report
+    for the whole run.
+    """
+
+    config = load_scoring_config(model_name)
+    if config is None:
+        return None
+
+    if any(name.startswith(GRAPH_FEATURE_PREFIXES) for name in config['feature_names']):
+        raise ValueError("Models trained with --graph-features cannot be batch scored: "
+                         "shards do not see the whole transaction graph")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    drift_reference = load_drift_reference() if drift else None
+    drift_dir = os.path.join(output_dir, 'drift')
+    if drift_reference is not None:
+        os.makedirs(drift_dir, exist_ok=True)
+
+    print(f"Scanning {input_path}...")
+    n_rows, feature_stats = collect_input_statistics(input_path, shard_size, config['feature_stats'])
+    n_shards = int(np.ceil(n_rows / shard_size))
+    input_stat = os.stat(input_path)
+
+    manifest = {
+        'input_path': os.path.abspath(input_path),
+        'input_size': input_stat.st_size,
+        'input_mtime': input_stat.st_mtime,
+        'model_name': config['model_name'],
+        'model_timestamp': config['model_timestamp'],
+        'threshold': threshold,
+        'shard_size': shard_size,
+        'n_rows': n_rows,
+        'n_shards': n_shards,
+        'output_format': output_format,
+        'drift_window_seconds': drift_window_seconds if drift_reference is not None else None,
+        'drift_windows': drift_windows if drift_reference is not None else None
+    }
+
+    # Existing shards are only reused when every setting that affects them matches
+    previous_manifest = load_manifest(output_dir)
+    if previous_manifest is not None:
+        mismatched = [key for key in sorted(set(manifest) | set(previous_manifest))
+                      if previous_manifest.get(key) != manifest.get(key)]
+        if mismatched:
+            raise ValueError(
+                f"Output directory was written with different settings ({', '.join(mismatched)}); "
+                f"resume with the same input, model and options or use a new output directory"
+            )
+
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    extension = 'parquet' if output_format == 'parquet' else 'csv'
+    shard_path = lambda i: os.path.join(output_dir, f'shard_{i:05d}.{extension}')
+
+    completed = [i for i in range(n_shards) if os.path.exists(shard_path(i))]
+    print(f"Scoring {n_rows} transactions in {n_shards} shards with {config['model_name']}")
+    if completed:
+        print(f"Resuming: {len(completed)} shards already scored")
+
+    n_workers = n_workers or os.cpu_count()
+    max_in_flight = 2 * n_workers
+    scored_rows = 0
+    start_time = time.time()
+
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_init_worker,
+        initargs=(config['model_name'], config['feature_names'], feature_stats, threshold,
+                  drift_reference, drift_dir, drift_window_seconds, drift_windows)
+    ) as executor:
+        pending = set()
+
+        for shard_id, shard_df in enumerate(pd.read_csv(input_path, chunksize=shard_size)):
+            if os.path.exists(shard_path(shard_id)):
+                continue
+
+            # Bound the number of shards held in memory at once
+            while len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    scored_rows += report_shard(future.result(), n_shards)
+
+            pending.add(executor.submit(score_shard, shard_id, shard_df, shard_path(shard_id), output_format))
+
+        for future in wait(pending).done:
+            scored_rows += report_shard(future.result(), n_shards)
+
+    elapsed = time.time() - start_time
+    rows_per_second = scored_rows / elapsed if elapsed > 0 else 0.0
+
+    print("\n" + "=" * 60)
+    print("BATCH SCORING COMPLETED")
+    print("=" * 60)
+    print(f"Rows scored this run: {scored_rows}")
+    print(f"Elapsed: {elapsed:.1f}s")
+    print(f"Throughput: {rows_per_second:,.0f} rows/second")
+    print(f"Output: {output_dir}")
+
+    drift_report = None
+    if drift_reference is not None:
+        monitor = merge_drift_monitors(drift_dir, drift_reference, drift_window_seconds, drift_windows)
+        drift_report = monitor.drift_report()
+
+        if drift_report is not None:
+            monitor.save(os.path.join(output_dir, 'drift_monitor_state.pkl'))
+            with open(os.path.join(output_dir, 'drift_report.json'), 'w') as f:
+                json.dump(drift_report, f, indent=2)
+
+            print()
+            print_drift_report(drift_report)
+
+    return {'rows_scored': scored_rows, 'elapsed_seconds': elapsed, 'rows_per_second': rows_per_second,
+            'drift_report': drift_report}
+
+def report_shard(result, n_shards):
+    """Print progress for a finished shard and return its row count"""
+    shard_id, rows, seconds = result
+    print(f"  shard {shard_id + 1}/{n_shards}: {rows} rows in {seconds:.2f}s ({rows / max(seconds, 1e-9):,.0f} rows/s)")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch score a transaction file with the trained models")
+    parser.add_argument('input', help="Raw transaction CSV (same columns as transaction_data_raw.csv)")
+    parser.add_argument('--output-dir', default='batch_scores', help="Directory for shard outputs")
+    parser.add_argument('--model', default=None, help="Model name (defaults to the best model)")
+    parser.add_argument('--shard-size', type=int, default=100000, help="Rows per shard")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (defaults to CPU count)")
+    parser.add_argument('--threshold', type=float, default=0.5, help="Fraud decision threshold")
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet', help="Output format")
+    parser.add_argument('--no-drift', action='store_true', help="Skip drift monitoring")
+    parser.add_argument('--drift-window-hours', type=float, default=24, help="Drift monitor window length")
+    parser.add_argument('--drift-windows', type=int, default=30, help="Number of most recent windows kept")
+    args = parser.parse_args()
+
+    run_batch_scoring(
+        args.input, args.output_dir, model_name=args.model, shard_size=args.shard_size,
+        n_workers=args.workers, threshold=args.threshold, output_format=args.format,
+        drift=not args.no_drift, drift_window_seconds=int(args.drift_window_hours * 3600),
+        drift_windows=args.drift_windows
+    )
@@ -0,0 +1,237 @@
+import pandas as pd
+import numpy as np
+import json
+import time
+import argparse
+import joblib
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import precision_score, recall_score
+
+def load_cascade_artifacts():
+    """Load trained models, scaler and the feature data"""
+    try:
+        trained_models = joblib.load('trained_models_latest.pkl')
+        scaler = joblib.load('scaler_latest.pkl')
+
+        X = pd.read_csv('features.csv')
+        y = pd.read_csv('labels.csv').squeeze()
+
+        return trained_models, scaler, X, y
+    except FileNotFoundError:
+        print("Model files not found. Please run train_ml_models.py first.")
+        return None, None, None, None
+
+class CascadeScorer:
+    """
+    Two-stage cascade: a cheap first-stage model scores every transaction.
+    Transactions with a first-stage probability below `low` are accepted
+    and above `high` are flagged without further work; only those inside
+    the [low, high] uncertainty band are escalated to the expensive second
+    stage (a single model or a soft-voting set of models).
+    """
+
+    def __init__(self, first_stage, second_stage, scaler, low=0.0, high=1.0, threshold=0.5):
+        self.first_stage = first_stage
+        self.second_stage = second_stage
+        self.scaler = scaler
+        self.low = low
+        self.high = high
+        self.threshold = threshold
+
+    def _predict(self, model_info, X):
+        X_model = self.scaler.transform(X) if model_info['scale_features'] else X
+        return model_info['model'].predict_proba(X_model)[:, 1]
+
+    def refit(self, X, y):
+        """Copy of the cascade with every stage model cloned and refit on X, y"""
+        def refit_stage(model_info):
+            X_model = self.scaler.transform(X) if model_info['scale_features'] else X
+            return {**model_info, 'model': clone(model_info['model']).fit(X_model, y)}
+
+        return CascadeScorer(refit_stage(self.first_stage), [refit_stage(info) for info in self.second_stage],
+                             self.scaler, self.low, self.high, self.threshold)
+
+    def first_stage_proba(self, X):
+        return self._predict(self.first_stage, X)
+
+    def second_stage_proba(self, X):
+        return np.mean([self._predict(model_info, X) for model_info in self.second_stage], axis=0)
+
+    def score(self, X):
+        """Fraud probabilities and the escalation mask"""
+        probabilities = self.first_stage_proba(X)
+        escalate = (probabilities >= self.low) & (probabilities <= self.high)
+
+        if escalate.any():
+            X_escalated = X[escalate] if not isinstance(X, pd.DataFrame) else X.loc[escalate]
+            probabilities[escalate] = self.second_stage_proba(X_escalated)
+
+        return probabilities, escalate
+
+    def predict(self, X):
+        probabilities, escalate = self.score(X)
+        # Outside the band the first stage decides: above `high` is fraud
+        return np.where(escalate, probabilities > self.threshold, probabilities > self.high).astype(int)
+
+    def calibrate(self, X_val, y_val, max_recall_loss=0.01, max_precision_loss=0.02, n_grid=50):
+        """
+        Pick the band that escalates the least traffic while keeping recall
+        (and precision) within the given loss of scoring every transaction
+        with the second stage.
+        """
+        y_val = np.asarray(y_val)
+        p1 = self.first_stage_proba(X_val)
+        p2 = self.second_stage_proba(X_val)
+
+        full_pred = p2 > self.threshold
+        full_recall = recall_score(y_val, full_pred)
+        full_precision = precision_score(y_val, full_pred, zero_division=0)
+
+        grid = np.unique(np.quantile(p1, np.linspace(0, 1, n_grid + 1)))
+        lows = np.concatenate([[0.0], grid])
+        highs = np.concatenate([grid, [1.0]])
+
+        best = (1.0, 0.0, 1.0)
+        for low in lows:
+            for high in highs[highs >= low]:
+                escalate = (p1 >= low) & (p1 <= high)
+                fraction = escalate.mean()
+                if fraction >= best[0]:
+                    continue
+
+                pred = np.where(escalate, full_pred, p1 > high)
+                recall_loss = full_recall - recall_score(y_val, pred)
+                precision_loss = full_precision - precision_score(y_val, pred, zero_division=0)
+
+                if recall_loss <= max_recall_loss and precision_loss <= max_precision_loss:
+                    best = (fraction, low, high)
+
+        _, self.low, self.high = best
+
+        pred = self.predict(X_val)
+        return {
+            'low': float(self.low),
+            'high': float(self.high),
+            'escalated_fraction': float(best[0]),
+            'full_recall': float(full_recall),
+            'cascade_recall': float(recall_score(y_val, pred)),
+            'full_precision': float(full_precision),
+            'cascade_precision': float(precision_score(y_val, pred, zero_division=0))
+        }
+
+def measure_latency(cascade, X, n_samples=500, random_state=42):
+    """
+    Per-transaction latency (single-row calls) of the cascade versus
+    sending every transaction to the second stage.
+    """
+    rows = X.sample(min(n_samples, len(X)), random_state=random_state)
+    cascade_ms = []
+    full_ms = []
+
+    for i in range(len(rows)):
+        row = rows.iloc[[i]]
+
+        start_time = time.perf_counter()
+        cascade.score(row)
+        cascade_ms.append((time.perf_counter() - start_time) * 1000)
+
+        start_time = time.perf_counter()
+        cascade.second_stage_proba(row)
+        full_ms.append((time.perf_counter() - start_time) * 1000)
+
+    summarize = lambda values: {
+        'mean': float(np.mean(values)),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'p99': float(np.percentile(values, 99))
+    }
+    return {'cascade_ms': summarize(cascade_ms), 'full_ms': summarize(full_ms)}
+
+def build_cascade(trained_models, scaler, first_stage_name='Logistic Regression', second_stage_names=None):
+    """
+    Cascade from the trained artifacts; the second stage defaults to the top
+    3 models by cross-validation score on the training split (the test
+    AUC is kept for evaluation only)
+    """
+    if second_stage_names is None:
+        ranked = sorted(trained_models, key=lambda name: trained_models[name].get('best_cv_score', 0), reverse=True)
+        second_stage_names = [name for name in ranked if name != first_stage_name][:3]
+
+    cascade = CascadeScorer(
+        trained_models[first_stage_name],
+        [trained_models[name] for name in second_stage_names],
+        scaler
+    )
+    return cascade, second_stage_names
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate a two-stage cascade scorer")
+    parser.add_argument('--first-stage', default='Logistic Regression', help="Cheap first-stage model")
+    parser.add_argument('--second-stage', default=None,
+                        help="Comma-separated expensive model(s); defaults to the top 3 by CV score")
+    parser.add_argument('--max-recall-loss', type=float, default=0.01, help="Allowed absolute recall loss")
+    parser.add_argument('--max-precision-loss', type=float, default=0.02, help="Allowed absolute precision loss")
+    parser.add_argument('--band', type=float, nargs=2, default=None, metavar=('LOW', 'HIGH'),
+                        help="Fixed uncertainty band instead of calibrating one")
+    args = parser.parse_args()
+
+    trained_models, scaler, X, y = load_cascade_artifacts()
+
+    if trained_models is not None:
+        # Same split as train_models_with_tuning: the band is calibrated on a
+        # validation split of the training data, the test hold-out only evaluates
+        X_train, X_eval, y_train, y_eval = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+        second_stage_names = args.second_stage.split(',') if args.second_stage else None
+        cascade, second_stage_names = build_cascade(trained_models, scaler, args.first_stage, second_stage_names)
+
+        if args.band:
+            cascade.low, cascade.high = args.band
+            calibration = {'low': cascade.low, 'high': cascade.high}
+        else:
+            # The saved models were fit on all of X_train, so the stages are refit
+            # without the validation rows to score them out of sample
+            X_fit, X_val, y_fit, y_val = train_test_split(
+                X_train, y_train, test_size=0.2, random_state=42, stratify=y_train
+            )
+            validation_cascade = cascade.refit(X_fit, y_fit)
+            calibration = validation_cascade.calibrate(X_val, y_val, args.max_recall_loss, args.max_precision_loss)
+            cascade.low, cascade.high = validation_cascade.low, validation_cascade.high
+
+        _, escalate = cascade.score(X_eval)
+        pred = cascade.predict(X_eval)
+        full_pred = (cascade.second_stage_proba(X_eval) > cascade.threshold).astype(int)
+        latency = measure_latency(cascade, X_eval)
+
+        report = {
+            'first_stage': args.first_stage,
+            'second_stage': second_stage_names,
+            'calibration': calibration,
+            'evaluation': {
+                'escalated_fraction': float(escalate.mean()),
+                'full_recall': float(recall_score(y_eval, full_pred)),
+                'cascade_recall': float(recall_score(y_eval, pred)),
+                'full_precision': float(precision_score(y_eval, full_pred, zero_division=0)),
+                'cascade_precision': float(precision_score(y_eval, pred, zero_division=0))
+            },
+            'latency': latency
+        }
+
+        print("CASCADE SCORER")
+        print("=" * 50)
+        print(f"First stage: {args.first_stage}")
+        print(f"Second stage: {', '.join(second_stage_names)}")
+        print(f"Uncertainty band: [{calibration['low']:.4f}, {calibration['high']:.4f}]")
+        print(f"\nEscalated traffic (evaluation): {report['evaluation']['escalated_fraction']:.2%}")
+        print(f"Recall: {report['evaluation']['cascade_recall']:.4f} (full: {report['evaluation']['full_recall']:.4f})")
+        print(f"Precision: {report['evaluation']['cascade_precision']:.4f} "
+              f"(full: {report['evaluation']['full_precision']:.4f})")
+        print("\nLatency per transaction (ms):")
+        for name in ['cascade_ms', 'full_ms']:
+            stats = latency[name]
+            print(f"  {name[:-3]:8s} mean={stats['mean']:.3f}  p95={stats['p95']:.3f}  p99={stats['p99']:.3f}")
+
+        with open('cascade_config_latest.json', 'w') as f:
+            json.dump(report, f, indent=2)
+        print("\nCascade configuration saved to 'cascade_config_latest.json'")
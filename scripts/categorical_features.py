@@ -0,0 +1,27 @@
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from generate_transaction_data import TRANSACTION_TYPES
+
+class TransactionTypeEncoder(BaseEstimator, TransformerMixin):
+    """
+    Collapse the one-hot type_* columns of the feature matrix back into a
+    single categorical 'type' column, for models with native categorical
+    support (HistGradientBoostingClassifier with categorical_features='from_dtype').
+    """
+
+    def fit(self, X, y=None):
+        X = pd.DataFrame(X)
+        self.feature_names_in_ = list(X.columns)
+        self.type_columns_ = [f'type_{t}' for t in TRANSACTION_TYPES if f'type_{t}' in X.columns]
+        return self
+
+    def transform(self, X):
+        if not isinstance(X, pd.DataFrame):
+            X = pd.DataFrame(X, columns=self.feature_names_in_)
+
+        one_hot = X[self.type_columns_].astype(float).values
+        types = [col[len('type_'):] for col in self.type_columns_]
+
+        encoded = X.drop(columns=self.type_columns_)
+        encoded['type'] = pd.Categorical.from_codes(one_hot.argmax(axis=1), categories=types)
+        return encoded
@@ -0,0 +1,45 @@
+import { readFileSync } from "fs"
+import path from "path"
+import { loadExportedModel, scoreExportedModel } from "../lib/model-export.ts"
+
+// Scores the fixture rows that scripts/train_ml_models.py writes next to the
+// export and compares the TypeScript scorer with sklearn's probabilities and
+// the Python path contributions. Runs TypeScript directly, so it needs
+// Node >= 22.6 (--experimental-strip-types)
+
+interface ExportFixture {
+  rows: Record<string, number>[]
+  probabilities: number[]
+  contributions: number[][]
+}
+
+const TOLERANCE = 1e-9
+const EXPORT_PREFIX = path.join(process.env.MODEL_EXPORT_DIR ?? process.cwd(), "model_export_latest")
+
+const model = loadExportedModel()
+if (!model) {
+  console.error("Exported model not found. Please run train_ml_models.py first.")
+  process.exit(1)
+}
+
+const fixture: ExportFixture = JSON.parse(readFileSync(`${EXPORT_PREFIX}_fixture.json`, "utf-8"))
+const featureNames = model.header.feature_names
+
+let maxProbabilityError = 0
+let maxContributionError = 0
+
+fixture.rows.forEach((row, i) => {
+  const { probability, contributions } = scoreExportedModel(model, row)
+  maxProbabilityError = Math.max(maxProbabilityError, Math.abs(probability - fixture.probabilities[i]))
+  featureNames.forEach((name, j) => {
+    maxContributionError = Math.max(maxContributionError, Math.abs(contributions[name] - fixture.contributions[i][j]))
+  })
+})
+
+const passed = maxProbabilityError <= TOLERANCE && maxContributionError <= TOLERANCE
+console.log(
+  `TypeScript scorer (${model.header.model_name}, ${fixture.rows.length} rows): ` +
+    `probability error ${maxProbabilityError.toExponential(2)}, ` +
+    `contribution error ${maxContributionError.toExponential(2)} -> ${passed ? "PASS" : "FAIL"}`,
+)
+process.exit(passed ? 0 : 1)
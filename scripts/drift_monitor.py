@@ -0,0 +1,327 @@
+import pandas as pd
+import numpy as np
+import json
+import joblib
+import warnings
+from datetime import datetime, timezone
+
+# PSI thresholds commonly used for population stability
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.2
+
+def compute_bin_edges(values, n_bins=20):
+    """Compute interior bin edges from reference quantiles"""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+
+    if len(values) == 0:
+        return np.array([])
+
+    unique_values = np.unique(values)
+
+    if len(unique_values) <= n_bins:
+        # Low-cardinality columns (flags, one-hot, hour): one bin per value
+        return (unique_values[:-1] + unique_values[1:]) / 2
+
+    quantiles = np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1])
+    return np.unique(quantiles)
+
+def histogram_counts(values, edges):
+    """Count values into the bins defined by interior edges"""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    bin_index = np.searchsorted(edges, values, side='right')
+    return np.bincount(bin_index, minlength=len(edges) + 1)
+
+def build_drift_reference(X, scores, n_bins=20):
+    """
+    Build reference histograms for every feature column and the model score
+    distribution. Bin edges are fixed here so that live sketches stay
+    aligned with (and mergeable against) the reference.
+    """
+    reference = {
+        'created_at': datetime.now().isoformat(),
+        'n_samples': int(len(X)),
+        'feature_names': list(X.columns),
+        'edges': {},
+        'counts': {}
+    }
+
+    for column in X.columns:
+        edges = compute_bin_edges(X[column].values, n_bins)
+        reference['edges'][column] = edges.tolist()
+        reference['counts'][column] = histogram_counts(X[column].values, edges).tolist()
+
+    score_edges = compute_bin_edges(scores, n_bins)
+    reference['score_edges'] = score_edges.tolist()
+    reference['score_counts'] = histogram_counts(scores, score_edges).tolist()
+
+    return reference
+
+def save_drift_reference(reference, timestamp):
+    """Save drift reference alongside the other model artifacts"""
+
+    with open(f'drift_reference_{timestamp}.json', 'w') as f:
+        json.dump(reference, f, indent=2)
+
+    with open('drift_reference_latest.json', 'w') as f:
+        json.dump(reference, f, indent=2)
+
+def load_drift_reference(path='drift_reference_latest.json'):
+    """Load a saved drift reference"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print("Drift reference not found. Please run train_ml_models.py first.")
+        return None
+
+def population_stability_index(expected_counts, actual_counts, eps=1e-4):
+    """PSI between two histograms sharing the same bins"""
+    expected = np.asarray(expected_counts, dtype=float)
+    actual = np.asarray(actual_counts, dtype=float)
+
+    expected = np.clip(expected / max(expected.sum(), 1), eps, None)
+    actual = np.clip(actual / max(actual.sum(), 1), eps, None)
+
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def ks_statistic(expected_counts, actual_counts):
+    """Kolmogorov-Smirnov distance between binned CDFs (a lower bound on the exact KS)"""
+    expected = np.asarray(expected_counts, dtype=float)
+    actual = np.asarray(actual_counts, dtype=float)
+
+    if expected.sum() == 0 or actual.sum() == 0:
+        return 0.0
+
+    expected_cdf = np.cumsum(expected) / expected.sum()
+    actual_cdf = np.cumsum(actual) / actual.sum()
+
+    return float(np.max(np.abs(expected_cdf - actual_cdf)))
+
+class DriftSketch:
+    """
+    Fixed-memory histogram sketch over every feature plus the model score.
+
+    Memory depends only on the number of features and bins, never on the
+    number of transactions seen. Sketches built from the same reference are
+    merged by adding counts, so per-worker sketches can be combined.
+    """
+
+    def __init__(self, reference):
+        self.feature_names = reference['feature_names']
+        self.edges = [np.asarray(reference['edges'][f]) for f in self.feature_names]
+        self.score_edges = np.asarray(reference['score_edges'])
+
+        max_bins = max(len(e) for e in self.edges) + 1
+        self.counts = np.zeros((len(self.feature_names), max_bins), dtype=np.int64)
+        self.score_counts = np.zeros(len(self.score_edges) + 1, dtype=np.int64)
+        self.n_samples = 0
+
+        # Edges of every feature padded with +inf, so all features are binned in one pass
+        self.padded_edges = np.full((len(self.edges), max_bins - 1), np.inf)
+        for i, edges in enumerate(self.edges):
+            self.padded_edges[i, :len(edges)] = edges
+        self.row_offsets = np.arange(len(self.edges)) * max_bins
+
+    def update(self, X, scores=None, chunk_size=10000):
+        """Add a batch of transactions (a single row is a batch of one)"""
+        if isinstance(X, pd.DataFrame):
+            X = X[self.feature_names].values
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+
+        for start in range(0, X.shape[0], chunk_size):
+            chunk = X[start:start + chunk_size]
+            # Number of edges <= value, i.e. searchsorted(edges, value, side='right')
+            bins = (self.padded_edges <= chunk[:, :, None]).sum(axis=2)
+            flat_bins = (self.row_offsets + bins)[~np.isnan(chunk)]
+            self.counts += np.bincount(flat_bins, minlength=self.counts.size).reshape(self.counts.shape)
+
+        if scores is not None:
+            self.score_counts += histogram_counts(np.atleast_1d(scores), self.score_edges)
+
+        self.n_samples += X.shape[0]
+
+    def merge(self, other):
+        """Merge another sketch built from the same reference into this one"""
+        if self.counts.shape != other.counts.shape or self.score_counts.shape != other.score_counts.shape:
+            raise ValueError("Cannot merge sketches built from different references")
+
+        self.counts += other.counts
+        self.score_counts += other.score_counts
+        self.n_samples += other.n_samples
+        return self
+
+    def feature_counts(self, index):
+        """Counts for one feature, trimmed to its own number of bins"""
+        return self.counts[index, :len(self.edges[index]) + 1]
+
+class DriftMonitor:
+    """
+    Rolling-window drift monitor.
+
+    Transactions are bucketed into fixed time windows by timestamp, so
+    monitors running in different worker processes agree on window
+    boundaries and can be merged. Only the most recent `n_windows` windows
+    are retained, which keeps memory fixed.
+    """
+
+    def __init__(self, reference, window_seconds=3600, n_windows=24):
+        self.reference = reference
+        self.window_seconds = window_seconds
+        self.n_windows = n_windows
+        self.windows = {}
+
+    def _window_ids(self, timestamps, n_rows):
+        # Numbers are epoch seconds; naive timestamps are taken as UTC, the
+        # same convention drift_report uses
+        if timestamps is None:
+            timestamps = np.full(n_rows, datetime.now(timezone.utc).timestamp())
+        elif isinstance(timestamps, datetime):
+            if timestamps.tzinfo is None:
+                timestamps = timestamps.replace(tzinfo=timezone.utc)
+            timestamps = np.full(n_rows, timestamps.timestamp())
+        else:
+            timestamps = np.atleast_1d(np.asarray(timestamps))
+            if timestamps.dtype.kind not in 'iuf':
+                timestamps = self._epoch_seconds(timestamps)
+        return (np.asarray(timestamps) // self.window_seconds).astype(np.int64)
+
+    @staticmethod
+    def _epoch_seconds(timestamps):
+        # numpy parses naive ISO 8601 strings and datetimes directly; anything
+        # else (time zones, other formats) goes through pandas
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                return timestamps.astype('datetime64[s]').astype(np.int64)
+        except (ValueError, TypeError, Warning):
+            timestamps = pd.to_datetime(pd.Series(timestamps))
+            if timestamps.dt.tz is not None:
+                timestamps = timestamps.dt.tz_convert('UTC').dt.tz_localize(None)
+            return ((timestamps - pd.Timestamp('1970-01-01')) // pd.Timedelta(seconds=1)).values
+
+    def _evict(self):
+        while len(self.windows) > self.n_windows:
+            del self.windows[min(self.windows)]
+
+    def update(self, X, scores=None, timestamps=None):
+        """Update the windowed sketches with newly scored transactions"""
+        if isinstance(X, pd.DataFrame):
+            X = X[self.reference['feature_names']].values
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        scores = None if scores is None else np.atleast_1d(scores)
+
+        window_ids = self._window_ids(timestamps, X.shape[0])
+
+        # Group rows by window once: a stable sort, then one slice per window
+        unique_ids, inverse = np.unique(window_ids, return_inverse=True)
+        if len(unique_ids) > 1:
+            order = np.argsort(inverse, kind='stable')
+            X = X[order]
+            scores = None if scores is None else scores[order]
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(inverse.ravel()))])
+
+        for window_id, start, end in zip(unique_ids.tolist(), bounds[:-1], bounds[1:]):
+            if window_id not in self.windows:
+                self.windows[window_id] = DriftSketch(self.reference)
+            self.windows[window_id].update(X[start:end], None if scores is None else scores[start:end])
+
+        self._evict()
+
+    def merge(self, other):
+        """Merge a monitor from another worker window by window"""
+        for window_id, sketch in other.windows.items():
+            if window_id in self.windows:
+                self.windows[window_id].merge(sketch)
+            else:
+                merged = DriftSketch(self.reference)
+                self.windows[window_id] = merged.merge(sketch)
+
+        self._evict()
+        return self
+
+    def drift_report(self, last_n_windows=None):
+        """Compute PSI/KS per feature and for the score over recent windows"""
+        window_ids = sorted(self.windows)
+        if last_n_windows is not None:
+            window_ids = window_ids[-last_n_windows:]
+
+        if not window_ids:
+            return None
+
+        combined = DriftSketch(self.reference)
+        for window_id in window_ids:
+            combined.merge(self.windows[window_id])
+
+        report = {
+            'window_start': datetime.fromtimestamp(window_ids[0] * self.window_seconds, timezone.utc).isoformat(),
+            'window_end': datetime.fromtimestamp((window_ids[-1] + 1) * self.window_seconds, timezone.utc).isoformat(),
+            'n_samples': int(combined.n_samples),
+            'features': {}
+        }
+
+        for i, feature in enumerate(combined.feature_names):
+            expected = self.reference['counts'][feature]
+            actual = combined.feature_counts(i)
+            report['features'][feature] = {
+                'psi': population_stability_index(expected, actual),
+                'ks': ks_statistic(expected, actual)
+            }
+
+        if combined.score_counts.sum() > 0:
+            report['score'] = {
+                'psi': population_stability_index(self.reference['score_counts'], combined.score_counts),
+                'ks': ks_statistic(self.reference['score_counts'], combined.score_counts)
+            }
+
+        report['drifted_features'] = [
+            feature for feature, stats in report['features'].items()
+            if stats['psi'] >= PSI_SIGNIFICANT
+        ]
+
+        return report
+
+    def save(self, path='drift_monitor_state.pkl'):
+        """Persist the monitor state"""
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path='drift_monitor_state.pkl'):
+        """Load a persisted monitor state"""
+        return joblib.load(path)
+
+def print_drift_report(report):
+    """Print a drift report in the same layout as the training summaries"""
+    print("Drift Report")
+    print("=" * 50)
+    print(f"Window: {report['window_start']} -> {report['window_end']}")
+    print(f"Transactions: {report['n_samples']}")
+    print()
+
+    sorted_features = sorted(report['features'].items(), key=lambda x: x[1]['psi'], reverse=True)
+
+    for feature, stats in sorted_features:
+        flag = ""
+        if stats['psi'] >= PSI_SIGNIFICANT:
+            flag = "  <-- significant drift"
+        elif stats['psi'] >= PSI_MODERATE:
+            flag = "  <-- moderate drift"
+        print(f"  {feature}: PSI={stats['psi']:.4f} KS={stats['ks']:.4f}{flag}")
+
+    if 'score' in report:
+        print(f"\nModel score: PSI={report['score']['psi']:.4f} KS={report['score']['ks']:.4f}")
+
+if __name__ == "__main__":
+    # Replay the training features through a monitor as a sanity check:
+    # the drift against the reference should be close to zero
+    reference = load_drift_reference()
+
+    if reference is not None:
+        X = pd.read_csv('features.csv')
+        raw = pd.read_csv('transaction_data_raw.csv')
+
+        monitor = DriftMonitor(reference, window_seconds=7 * 24 * 3600, n_windows=60)
+        monitor.update(X, timestamps=raw['timestamp'])
+
+        print_drift_report(monitor.drift_report())
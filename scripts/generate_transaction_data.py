@@ -1,29 +1,38 @@
 import pandas as pd
 import numpy as np
 import json
+import argparse
 from datetime import datetime, timedelta
 import random
+from graph_features import add_graph_features, GRAPH_FEATURE_PREFIXES
 
 # Set random seed for reproducibility
 np.random.seed(42)
 random.seed(42)
 
+# Shared transaction vocabulary (also used by generate_transaction_data_parallel.py)
+TRANSACTION_TYPES = ['CASH_IN', 'CASH_OUT', 'TRANSFER', 'PAYMENT', 'DEBIT']
+COUNTRIES = ['US', 'UK', 'KE', 'UG', 'TZ', 'GH', 'NG']
+SUSPICIOUS_COUNTRIES = ['XX', 'YY', 'ZZ']
+NUM_USERS = 5000
+NUM_MERCHANTS = 500
+
 def generate_mobile_money_transactions(num_transactions=10000):
     """
     Generate synthetic mobile money transaction data with both legitimate and fraudulent patterns
     """
     
     # Transaction types and their typical patterns
-    transaction_types = ['CASH_IN', 'CASH_OUT', 'TRANSFER', 'PAYMENT', 'DEBIT']
+    transaction_types = TRANSACTION_TYPES
     
     # Generate base transaction data
     transactions = []
     
     # Generate user IDs (simulate a user base)
-    user_ids = [f"USER_{i:06d}" for i in range(1, 5001)]
+    user_ids = [f"USER_{i:06d}" for i in range(1, NUM_USERS + 1)]
     
     # Generate merchant IDs
-    merchant_ids = [f"MERCHANT_{i:04d}" for i in range(1, 501)]
+    merchant_ids = [f"MERCHANT_{i:04d}" for i in range(1, NUM_MERCHANTS + 1)]
     
     for i in range(num_transactions):
         # Basic transaction info
@@ -66,8 +75,8 @@ def generate_mobile_money_transactions(num_transactions=10000):
             dest_balance_after = dest_balance_before
         
         # Generate location data
-        origin_country = random.choice(['US', 'UK', 'KE', 'UG', 'TZ', 'GH', 'NG'])
-        dest_country = origin_country if random.random() > 0.05 else random.choice(['US', 'UK', 'KE', 'UG', 'TZ', 'GH', 'NG'])
+        origin_country = random.choice(COUNTRIES)
+        dest_country = origin_country if random.random() > 0.05 else random.choice(COUNTRIES)
         
         # Determine if transaction is fraudulent (10% fraud rate)
         is_fraud = random.random() < 0.1
@@ -78,7 +87,7 @@ def generate_mobile_money_transactions(num_transactions=10000):
             if random.random() < 0.3:  # High amount fraud
                 amount *= random.uniform(5, 20)
             if random.random() < 0.4:  # Cross-border fraud
-                dest_country = random.choice(['XX', 'YY', 'ZZ'])  # Suspicious countries
+                dest_country = random.choice(SUSPICIOUS_COUNTRIES)  # Suspicious countries
             if random.random() < 0.5:  # Unusual time fraud
                 timestamp = timestamp.replace(hour=random.randint(2, 4))  # Late night
             if random.random() < 0.3:  # Multiple rapid transactions
@@ -105,11 +114,16 @@ def generate_mobile_money_transactions(num_transactions=10000):
     
     return pd.DataFrame(transactions)
 
-def engineer_features(df):
+def engineer_features(df, feature_stats=None):
     """
     Create engineered features for fraud detection
+
+    feature_stats optionally fixes the dataset-level statistics
+    ('amount_mean', 'amount_std', 'user_counts') so that a slice of a larger
+    dataset gets the same features it would get if engineered in full.
     """
     df = df.copy()
+    feature_stats = feature_stats or {}
     
     # Convert timestamp to datetime
     df['timestamp'] = pd.to_datetime(df['timestamp'])
@@ -122,7 +136,9 @@ def engineer_features(df):
     
     # Amount-based features
     df['amount_log'] = np.log1p(df['amount'])
-    df['amount_zscore'] = (df['amount'] - df['amount'].mean()) / df['amount'].std()
+    amount_mean = feature_stats.get('amount_mean', df['amount'].mean())
+    amount_std = feature_stats.get('amount_std', df['amount'].std())
+    df['amount_zscore'] = (df['amount'] - amount_mean) / amount_std
     
     # Balance-based features
     df['balance_change_origin'] = df['origin_balance_after'] - df['origin_balance_before']
@@ -140,14 +156,18 @@ def engineer_features(df):
     df['is_merchant_dest'] = df['dest_user'].str.contains('MERCHANT').astype(int)
     
     # Velocity features (simplified - in real system would use time windows)
-    user_counts = df['origin_user'].value_counts()
+    user_counts = feature_stats.get('user_counts', df['origin_user'].value_counts())
     df['user_transaction_count'] = df['origin_user'].map(user_counts)
     
     return df
 
-def preprocess_for_ml(df):
+def preprocess_for_ml(df, graph_features=False, graph_window=None):
     """
     Prepare data for machine learning models
+
+    graph_features adds the origin/destination account features of a
+    TransactionGraph over the data (window=graph_window), computed as of
+    each transaction's day (see graph_features.add_graph_features)
     """
     # Select features for ML
     feature_columns = [
@@ -162,6 +182,11 @@ def preprocess_for_ml(df):
     type_columns = [col for col in df.columns if col.startswith('type_')]
     feature_columns.extend(type_columns)
     
+    # Account graph features (opt-in)
+    if graph_features:
+        df = add_graph_features(df, window=graph_window)
+        feature_columns.extend([col for col in df.columns if col.startswith(GRAPH_FEATURE_PREFIXES)])
+    
     # Create feature matrix
     X = df[feature_columns].fillna(0)
     y = df['is_fraud']
@@ -169,6 +194,11 @@ def preprocess_for_ml(df):
     return X, y, feature_columns
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic mobile money transactions")
+    parser.add_argument('--graph-features', action='store_true',
+                        help="Add account transaction-graph features (not computed by batch_score.py)")
+    args = parser.parse_args()
+    
     print("Generating mobile money transaction data...")
     
     # Generate transaction data
@@ -178,7 +208,7 @@ if __name__ == "__main__":
     df_features = engineer_features(df)
     
     # Prepare for ML
-    X, y, feature_names = preprocess_for_ml(df_features)
+    X, y, feature_names = preprocess_for_ml(df_features, graph_features=args.graph_features)
     
     # Save data
     df.to_csv('transaction_data_raw.csv', index=False)
@@ -192,6 +222,13 @@ if __name__ == "__main__":
     with open('feature_names.json', 'w') as f:
         json.dump(feature_names, f)
     
+    # Save dataset-level statistics used by engineer_features
+    with open('feature_stats.json', 'w') as f:
+        json.dump({
+            'amount_mean': float(df['amount'].mean()),
+            'amount_std': float(df['amount'].std())
+        }, f, indent=2)
+    
     print(f"Generated {len(df)} transactions")
     print(f"Fraud rate: {df['is_fraud'].mean():.2%}")
     print(f"Features created: {len(feature_names)}")
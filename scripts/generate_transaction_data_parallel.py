@@ -0,0 +1,190 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from generate_transaction_data import (TRANSACTION_TYPES, COUNTRIES, SUSPICIOUS_COUNTRIES,
+                                       NUM_USERS, NUM_MERCHANTS)
+
+# Lognormal (mean, sigma) of the amount for each transaction type,
+# same distributions as generate_mobile_money_transactions
+AMOUNT_LOGNORMAL_PARAMS = {
+    'CASH_IN': (4, 1.5),
+    'CASH_OUT': (3.5, 1.2),
+    'TRANSFER': (3, 1.8),
+    'PAYMENT': (2.5, 1.5),
+    'DEBIT': (2, 1)
+}
+
+# Types that debit the origin account
+DEBIT_TYPES = ['CASH_OUT', 'TRANSFER', 'PAYMENT', 'DEBIT']
+
+def account_ids(num_users=NUM_USERS, num_merchants=NUM_MERCHANTS):
+    """User and merchant ID pools shared by every shard"""
+    user_ids = np.char.mod('USER_%06d', np.arange(1, num_users + 1))
+    merchant_ids = np.char.mod('MERCHANT_%04d', np.arange(1, num_merchants + 1))
+    return user_ids, merchant_ids
+
+def generate_transaction_shard(start, num_rows, seed_sequence, end_time,
+                               num_users=NUM_USERS, num_merchants=NUM_MERCHANTS):
+    """
+    Vectorized generation of rows [start, start + num_rows).
+
+    All randomness comes from the shard's own SeedSequence stream and every
+    random array is drawn for every row in a fixed order, so a shard's
+    content depends only on (start, num_rows, seed_sequence, end_time).
+    """
+    rng = np.random.default_rng(seed_sequence)
+    user_ids, merchant_ids = account_ids(num_users, num_merchants)
+    all_ids = np.concatenate([user_ids, merchant_ids])
+
+    transaction_ids = np.char.mod('TXN_%08d', np.arange(start, start + num_rows))
+
+    # Timestamps within the year before end_time
+    offsets = (pd.to_timedelta(rng.integers(0, 366, num_rows), unit='D') +
+               pd.to_timedelta(rng.integers(0, 24, num_rows), unit='h') +
+               pd.to_timedelta(rng.integers(0, 60, num_rows), unit='m'))
+    timestamps = pd.Series(pd.Timestamp(end_time) - offsets)
+
+    type_codes = rng.integers(0, len(TRANSACTION_TYPES), num_rows)
+    types = np.array(TRANSACTION_TYPES)[type_codes]
+
+    origin_users = user_ids[rng.integers(0, len(user_ids), num_rows)]
+    dest_users = all_ids[rng.integers(0, len(all_ids), num_rows)]
+
+    amount_mean = np.array([AMOUNT_LOGNORMAL_PARAMS[t][0] for t in TRANSACTION_TYPES])[type_codes]
+    amount_sigma = np.array([AMOUNT_LOGNORMAL_PARAMS[t][1] for t in TRANSACTION_TYPES])[type_codes]
+    amounts = np.round(np.maximum(rng.lognormal(amount_mean, amount_sigma), 1), 2)
+
+    origin_balance_before = amounts + rng.exponential(scale=1000, size=num_rows)
+    dest_balance_before = rng.exponential(scale=800, size=num_rows)
+
+    is_debit = np.isin(types, DEBIT_TYPES)
+    origin_balance_after = np.where(is_debit, origin_balance_before - amounts, origin_balance_before + amounts)
+    dest_balance_after = np.where(is_debit, dest_balance_before + amounts, dest_balance_before)
+
+    origin_countries = np.array(COUNTRIES)[rng.integers(0, len(COUNTRIES), num_rows)]
+    other_countries = np.array(COUNTRIES)[rng.integers(0, len(COUNTRIES), num_rows)]
+    dest_countries = np.where(rng.random(num_rows) > 0.05, origin_countries, other_countries)
+
+    # Fraud patterns (10% fraud rate)
+    is_fraud = rng.random(num_rows) < 0.1
+    high_amount = is_fraud & (rng.random(num_rows) < 0.3)
+    cross_border = is_fraud & (rng.random(num_rows) < 0.4)
+    unusual_time = is_fraud & (rng.random(num_rows) < 0.5)
+    rapid = is_fraud & (rng.random(num_rows) < 0.3)
+
+    amount_multiplier = rng.uniform(5, 20, num_rows)
+    suspicious_countries = np.array(SUSPICIOUS_COUNTRIES)[rng.integers(0, len(SUSPICIOUS_COUNTRIES), num_rows)]
+    night_hours = rng.integers(2, 5, num_rows)
+    rapid_seconds = rng.integers(1, 31, num_rows)
+
+    amounts = np.where(high_amount, amounts * amount_multiplier, amounts)
+    dest_countries = np.where(cross_border, suspicious_countries, dest_countries)
+    night_shift = pd.to_timedelta(np.where(unusual_time, night_hours - timestamps.dt.hour, 0), unit='h')
+    timestamps = timestamps + night_shift + pd.to_timedelta(np.where(rapid, rapid_seconds, 0), unit='s')
+
+    return pd.DataFrame({
+        'transaction_id': transaction_ids,
+        'timestamp': timestamps.dt.strftime('%Y-%m-%dT%H:%M:%S'),
+        'type': types,
+        'amount': amounts,
+        'origin_user': origin_users,
+        'dest_user': dest_users,
+        'origin_balance_before': np.round(origin_balance_before, 2),
+        'origin_balance_after': np.round(origin_balance_after, 2),
+        'dest_balance_before': np.round(dest_balance_before, 2),
+        'dest_balance_after': np.round(dest_balance_after, 2),
+        'origin_country': origin_countries,
+        'dest_country': dest_countries,
+        'is_fraud': is_fraud.astype(int)
+    })
+
+def _write_shard(shard_index, start, num_rows, seed_sequence, end_time, output_path, output_format):
+    """Generate one shard and write it as its own file"""
+    df = generate_transaction_shard(start, num_rows, seed_sequence, end_time)
+
+    tmp_path = output_path + '.tmp'
+    if output_format == 'parquet':
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+
+    return shard_index, num_rows
+
+def generate_sharded_transactions(num_transactions, output_dir, shard_size=1000000, n_workers=None,
+                                  seed=42, end_time=None, output_format='parquet'):
+    """
+    Generate num_transactions rows as independent shards across worker processes.
+
+    Shard boundaries depend only on shard_size and each shard gets a
+    SeedSequence child spawned by index, so the output is identical for
+    any number of workers.
+    """
+    if end_time is None:
+        end_time = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    end_time = pd.Timestamp(end_time)
+
+    n_shards = int(np.ceil(num_transactions / shard_size))
+    seed_sequences = np.random.SeedSequence(seed).spawn(n_shards)
+    extension = 'parquet' if output_format == 'parquet' else 'csv'
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    manifest = {
+        'num_transactions': num_transactions,
+        'shard_size': shard_size,
+        'n_shards': n_shards,
+        'seed': seed,
+        'end_time': end_time.isoformat(),
+        'output_format': output_format,
+        'shards': [f'transactions_{i:05d}.{extension}' for i in range(n_shards)]
+    }
+
+    print(f"Generating {num_transactions} transactions in {n_shards} shards...")
+    start_time = time.time()
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = []
+        for i in range(n_shards):
+            start = i * shard_size
+            num_rows = min(shard_size, num_transactions - start)
+            output_path = os.path.join(output_dir, manifest['shards'][i])
+            futures.append(executor.submit(
+                _write_shard, i, start, num_rows, seed_sequences[i], end_time, output_path, output_format
+            ))
+
+        for future in futures:
+            shard_index, num_rows = future.result()
+            print(f"  shard {shard_index + 1}/{n_shards}: {num_rows} rows")
+
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    elapsed = time.time() - start_time
+    print(f"Generated {num_transactions} transactions in {elapsed:.1f}s "
+          f"({num_transactions / max(elapsed, 1e-9):,.0f} rows/second)")
+
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic transactions in parallel shards")
+    parser.add_argument('num_transactions', type=int, help="Total number of transactions")
+    parser.add_argument('--output-dir', default='transaction_shards', help="Directory for shard files")
+    parser.add_argument('--shard-size', type=int, default=1000000, help="Rows per shard")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (defaults to CPU count)")
+    parser.add_argument('--seed', type=int, default=42, help="Root seed for the SeedSequence")
+    parser.add_argument('--end-time', default=None,
+                        help="Latest timestamp (ISO format); defaults to today at midnight. "
+                             "Pass the same value to reproduce a dataset exactly")
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet', help="Output format")
+    args = parser.parse_args()
+
+    generate_sharded_transactions(
+        args.num_transactions, args.output_dir, shard_size=args.shard_size, n_workers=args.workers,
+        seed=args.seed, end_time=args.end_time, output_format=args.format
+    )
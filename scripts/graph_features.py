@@ -0,0 +1,281 @@
+import pandas as pd
+import numpy as np
+import scipy.sparse as sp
+from itertools import repeat
+
+# Per-account graph features joined onto each transaction
+ORIGIN_GRAPH_FEATURES = [
+    'out_degree', 'unique_out_counterparties', 'two_hop_reach',
+    'rapid_cash_out_ratio', 'is_fan_in_cash_out'
+]
+DEST_GRAPH_FEATURES = [
+    'in_degree', 'unique_in_counterparties', 'two_hop_reach',
+    'rapid_cash_out_ratio', 'is_fan_in_cash_out'
+]
+
+# Column prefixes of the joined features (see add_graph_features)
+GRAPH_FEATURE_PREFIXES = ('origin_graph_', 'dest_graph_')
+
+def _to_ns(timestamps):
+    """Convert timestamps to int64 nanoseconds since the epoch"""
+    return pd.to_datetime(timestamps).values.astype('datetime64[ns]').astype(np.int64)
+
+class TransactionGraph:
+    """
+    Sparse user/merchant transaction graph over a sliding time window
+    (window=None keeps every transaction).
+
+    Edges are stored as CSR matrices (transaction counts and amounts), so
+    degree, counterparty and reach features are row/column operations on the
+    whole graph at once. New transactions are added and transactions older
+    than `window` are subtracted incrementally; the graph is never rebuilt.
+    The edge log used for expiry is append-only: each batch is sorted on its
+    own and kept as a chunk, so an update costs work proportional to the
+    batch and to the edges it expires, not to the window.
+
+    Fan-in-then-cash-out: a CASH_OUT by an account within `cash_out_window`
+    of money arriving at that account counts as a rapid cash-out. Accounts
+    with many distinct senders and a high rapid cash-out ratio match the
+    typical mule pattern.
+    """
+
+    def __init__(self, window=pd.Timedelta(days=30), cash_out_window=pd.Timedelta(hours=24),
+                 min_fan_in=3, min_cash_out_ratio=0.5):
+        self.window_ns = None if window is None else pd.Timedelta(window).value
+        self.cash_out_window_ns = pd.Timedelta(cash_out_window).value
+        self.min_fan_in = min_fan_in
+        self.min_cash_out_ratio = min_cash_out_ratio
+
+        self.node_index = {}
+        self.node_ids = []
+        self.counts = sp.csr_matrix((0, 0), dtype=np.int64)
+        self.amounts = sp.csr_matrix((0, 0), dtype=np.float64)
+        self.last_inbound_ns = np.zeros(0, dtype=np.int64)
+        self.rapid_cash_out_amount = np.zeros(0, dtype=np.float64)
+
+        # Edge log kept only for expiring edges out of the window: one
+        # time-sorted chunk (dict of arrays) per batch, oldest batch first
+        self.edge_chunks = []
+        self.latest_ns = np.iinfo(np.int64).min
+
+    @property
+    def n_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def n_window_transactions(self):
+        return sum(len(chunk['time_ns']) for chunk in self.edge_chunks)
+
+    def _index_nodes(self, ids):
+        """Map account ids to integer node indices, growing the graph as needed"""
+        codes, uniques = pd.factorize(ids)
+        uniques = np.asarray(uniques, dtype=object)
+
+        # Batch-sized dict lookups (map runs in C), new accounts appended in one go
+        mapped = np.fromiter(map(self.node_index.get, uniques, repeat(-1)), dtype=np.int64, count=len(uniques))
+        is_new = mapped < 0
+        if is_new.any():
+            new_ids = uniques[is_new].tolist()
+            mapped[is_new] = np.arange(len(self.node_ids), len(self.node_ids) + len(new_ids))
+            self.node_index.update(zip(new_ids, mapped[is_new].tolist()))
+            self.node_ids.extend(new_ids)
+
+        return mapped[codes]
+
+    def _resize(self):
+        n = self.n_nodes
+        if self.counts.shape[0] == n:
+            return
+
+        grow = n - self.counts.shape[0]
+        self.counts.resize((n, n))
+        self.amounts.resize((n, n))
+        self.last_inbound_ns = np.concatenate([self.last_inbound_ns, np.full(grow, np.iinfo(np.int64).min)])
+        self.rapid_cash_out_amount = np.concatenate([self.rapid_cash_out_amount, np.zeros(grow)])
+
+    def _edge_matrix(self, src, dst, values, dtype):
+        n = self.n_nodes
+        return sp.coo_matrix((values.astype(dtype), (src, dst)), shape=(n, n)).tocsr()
+
+    def _rapid_cash_outs(self, time_ns, src, dst, amounts, is_cash_out):
+        """Amount of each new transaction that is a cash-out shortly after an inflow"""
+        inbound = pd.DataFrame({'time_ns': time_ns, 'account': dst}).sort_values('time_ns')
+        cash_outs = pd.DataFrame({
+            'row': np.flatnonzero(is_cash_out),
+            'time_ns': time_ns[is_cash_out],
+            'account': src[is_cash_out]
+        }).sort_values('time_ns')
+
+        rapid = np.zeros(len(time_ns))
+        if len(cash_outs) > 0:
+            matched = pd.merge_asof(
+                cash_outs, inbound.rename(columns={'time_ns': 'inbound_ns'}),
+                left_on='time_ns', right_on='inbound_ns', by='account', direction='backward'
+            )
+            # Fall back to the last inflow seen in earlier batches
+            previous = self.last_inbound_ns[matched['account'].values]
+            inbound_ns = matched['inbound_ns'].fillna(-np.inf).values
+            last_inflow = np.maximum(inbound_ns, previous)
+            is_rapid = (matched['time_ns'].values - last_inflow) <= self.cash_out_window_ns
+            rapid[matched['row'].values[is_rapid]] = amounts[matched['row'].values[is_rapid]]
+
+        latest_inbound = inbound.groupby('account')['time_ns'].max()
+        self.last_inbound_ns[latest_inbound.index.values] = np.maximum(
+            self.last_inbound_ns[latest_inbound.index.values], latest_inbound.values
+        )
+
+        return rapid
+
+    def update(self, df):
+        """
+        Add a batch of transactions (columns: timestamp, origin_user,
+        dest_user, amount, type) and expire edges that left the window.
+        """
+        time_ns = _to_ns(df['timestamp'])
+        src = self._index_nodes(df['origin_user'].values)
+        dst = self._index_nodes(df['dest_user'].values)
+        amounts = df['amount'].values.astype(float)
+        is_cash_out = (df['type'] == 'CASH_OUT').values
+        self._resize()
+
+        rapid = self._rapid_cash_outs(time_ns, src, dst, amounts, is_cash_out)
+        np.add.at(self.rapid_cash_out_amount, src, rapid)
+
+        self.counts = self.counts + self._edge_matrix(src, dst, np.ones(len(src)), np.int64)
+        self.amounts = self.amounts + self._edge_matrix(src, dst, amounts, np.float64)
+
+        if len(time_ns) > 0:
+            order = np.argsort(time_ns, kind='stable')
+            self.edge_chunks.append({
+                'time_ns': time_ns[order], 'src': src[order], 'dst': dst[order],
+                'amount': amounts[order], 'rapid_cash_out': rapid[order]
+            })
+            self.latest_ns = max(self.latest_ns, int(time_ns.max()))
+
+        if self.window_ns is not None:
+            self.expire(self.latest_ns - self.window_ns)
+
+        return self
+
+    def expire(self, cutoff_ns):
+        """Subtract every edge older than cutoff_ns from the graph"""
+        expired = []
+        remaining = []
+
+        # Every chunk is sorted, so its expired edges are a prefix; checking
+        # each chunk keeps out-of-order batches correct
+        for chunk in self.edge_chunks:
+            n_expired = int(np.searchsorted(chunk['time_ns'], cutoff_ns, side='left'))
+            if n_expired > 0:
+                expired.append({key: values[:n_expired] for key, values in chunk.items()})
+            if n_expired < len(chunk['time_ns']):
+                remaining.append({key: values[n_expired:] for key, values in chunk.items()})
+
+        if not expired:
+            return
+
+        self.edge_chunks = remaining
+        src = np.concatenate([chunk['src'] for chunk in expired])
+        dst = np.concatenate([chunk['dst'] for chunk in expired])
+        expired_amounts = np.concatenate([chunk['amount'] for chunk in expired])
+        expired_rapid = np.concatenate([chunk['rapid_cash_out'] for chunk in expired])
+
+        self.counts = self.counts - self._edge_matrix(src, dst, np.ones(len(src)), np.int64)
+        self.counts.eliminate_zeros()
+
+        # Drop float residue on edges whose transactions have all expired
+        self.amounts = self.amounts - self._edge_matrix(src, dst, expired_amounts, np.float64)
+        self.amounts = self.amounts.multiply(self.counts > 0).tocsr()
+
+        np.subtract.at(self.rapid_cash_out_amount, src, expired_rapid)
+
+    def node_features(self):
+        """Compute per-account features for every node in the graph"""
+        counts = self.counts
+        linked = (counts > 0).astype(np.int64).tocsr()
+
+        out_amount = np.asarray(self.amounts.sum(axis=1)).ravel()
+        in_amount = np.asarray(self.amounts.sum(axis=0)).ravel()
+
+        # Distinct accounts reachable within two hops, excluding the account itself
+        reach = (linked + linked @ linked).tocsr()
+        reach.setdiag(0)
+        reach.eliminate_zeros()
+
+        unique_in = np.bincount(linked.indices, minlength=self.n_nodes)
+        rapid_ratio = np.divide(
+            self.rapid_cash_out_amount, in_amount,
+            out=np.zeros(self.n_nodes), where=in_amount > 0
+        )
+        rapid_ratio = np.clip(rapid_ratio, 0, 1)
+
+        return pd.DataFrame({
+            'out_degree': np.asarray(counts.sum(axis=1)).ravel(),
+            'in_degree': np.asarray(counts.sum(axis=0)).ravel(),
+            'out_amount': out_amount,
+            'in_amount': in_amount,
+            'unique_out_counterparties': np.diff(linked.indptr),
+            'unique_in_counterparties': unique_in,
+            'two_hop_reach': np.diff(reach.indptr),
+            'rapid_cash_out_amount': self.rapid_cash_out_amount,
+            'rapid_cash_out_ratio': rapid_ratio,
+            'is_fan_in_cash_out': ((unique_in >= self.min_fan_in) &
+                                   (rapid_ratio >= self.min_cash_out_ratio)).astype(int)
+        }, index=pd.Index(self.node_ids, name='account'))
+
+def _join_graph_features(df, node_features):
+    origin = node_features[ORIGIN_GRAPH_FEATURES].add_prefix(GRAPH_FEATURE_PREFIXES[0])
+    dest = node_features[DEST_GRAPH_FEATURES].add_prefix(GRAPH_FEATURE_PREFIXES[1])
+
+    df = df.join(origin, on='origin_user').join(dest, on='dest_user')
+    graph_columns = list(origin.columns) + list(dest.columns)
+    df[graph_columns] = df[graph_columns].fillna(0)
+    return df
+
+def add_graph_features(df, graph=None, window=None, freq='1D'):
+    """
+    Join origin and destination account graph features onto transactions.
+
+    With an (incrementally maintained) graph passed in, every row gets the
+    features of that graph as it stands. Otherwise the features are computed
+    as of each transaction's timestamp: the rows are replayed in `freq`
+    time buckets, each bucket is joined against the graph of all earlier
+    buckets and then added to it. A transaction never sees itself, later
+    transactions or others in its own bucket.
+    """
+    if graph is not None:
+        return _join_graph_features(df.copy(), graph.node_features())
+
+    graph = TransactionGraph(window=window)
+    buckets = pd.to_datetime(df['timestamp']).dt.floor(freq)
+
+    joined = []
+    for _, bucket in df.groupby(buckets, sort=True):
+        joined.append(_join_graph_features(bucket.copy(), graph.node_features()))
+        graph.update(bucket)
+
+    return pd.concat(joined).loc[df.index]
+
+if __name__ == "__main__":
+    try:
+        df = pd.read_csv('transaction_data_raw.csv')
+    except FileNotFoundError:
+        print("Data files not found. Please run generate_transaction_data.py first.")
+        df = None
+
+    if df is not None:
+        df = df.sort_values('timestamp')
+
+        # Feed the data day by day, as a daily refresh would
+        graph = TransactionGraph(window=pd.Timedelta(days=30))
+        for _, day in df.groupby(pd.to_datetime(df['timestamp']).dt.date):
+            graph.update(day)
+
+        node_features = graph.node_features()
+
+        print(f"Graph: {graph.n_nodes} accounts, {graph.counts.nnz} edges, "
+              f"{graph.n_window_transactions} transactions in window")
+        print(f"Fan-in-then-cash-out accounts: {node_features['is_fan_in_cash_out'].sum()}")
+
+        print("\nTop accounts by distinct senders:")
+        print(node_features.sort_values('unique_in_counterparties', ascending=False).head(10))
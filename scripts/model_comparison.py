@@ -194,6 +194,8 @@ def generate_model_report():
         report.append(f"  F1:  {row['F1 Score']:.4f}")
         report.append(f"  Precision: {row['Precision']:.4f}")
         report.append(f"  Recall: {row['Recall']:.4f}")
+        if 'training_time' in model_results[row['Model']]:
+            report.append(f"  Training time: {model_results[row['Model']]['training_time']:.2f}s")
         report.append("")
     
     # Top features summary
@@ -0,0 +1,98 @@
+import numpy as np
+from scipy import stats
+from joblib import Parallel, delayed
+from sklearn.metrics import roc_auc_score
+
+def stratified_subsample(y, max_samples, random_state=42):
+    """Indices of a class-stratified subsample of at most max_samples rows"""
+    y = np.asarray(y)
+    if len(y) <= max_samples:
+        return np.arange(len(y))
+
+    rng = np.random.default_rng(random_state)
+    indices = []
+
+    for label in np.unique(y):
+        label_indices = np.flatnonzero(y == label)
+        n_label = max(1, int(round(max_samples * len(label_indices) / len(y))))
+        indices.append(rng.choice(label_indices, size=n_label, replace=False))
+
+    return np.sort(np.concatenate(indices))
+
+def _permuted_score_drops(model, X, y, base_score, feature_index, seeds):
+    """Score drop for each permutation of one feature column"""
+    X_permuted = X.copy()
+    drops = []
+
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        X_permuted[:, feature_index] = rng.permutation(X[:, feature_index])
+        y_pred_proba = model.predict_proba(X_permuted)[:, 1]
+        drops.append(base_score - roc_auc_score(y, y_pred_proba))
+
+    return feature_index, drops
+
+def compute_permutation_importance(model, X, y, max_samples=2000, repeats_per_round=5,
+                                   min_repeats=5, max_repeats=30, ci_tolerance=0.005,
+                                   confidence=0.95, n_jobs=-1, random_state=42):
+    """
+    Model-agnostic permutation importance (drop in ROC AUC).
+
+    Runs on a stratified subsample of the evaluation data. The unpermuted
+    predictions and score are computed once and reused for every feature.
+    Feature x repeat work is spread across cores in rounds, and a feature
+    stops receiving repeats once the confidence interval half-width of its
+    mean drop falls below ci_tolerance.
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y)
+
+    sample_indices = stratified_subsample(y, max_samples, random_state)
+    X_sample = X[sample_indices]
+    y_sample = y[sample_indices]
+
+    # Base predictions are computed once and reused
+    base_proba = model.predict_proba(X_sample)[:, 1]
+    base_score = roc_auc_score(y_sample, base_proba)
+
+    n_features = X.shape[1]
+    drops = {i: [] for i in range(n_features)}
+
+    # Permuting a constant column cannot change the predictions
+    constant = [i for i in range(n_features) if np.all(X_sample[:, i] == X_sample[0, i])]
+    for i in constant:
+        drops[i] = [0.0] * min_repeats
+    active = [i for i in range(n_features) if i not in constant]
+
+    rng = np.random.default_rng(random_state)
+    ci_half_width = np.zeros(n_features)
+
+    with Parallel(n_jobs=n_jobs) as parallel:
+        while active:
+            tasks = [(i, rng.integers(0, 2**31, size=repeats_per_round)) for i in active]
+            results = parallel(
+                delayed(_permuted_score_drops)(model, X_sample, y_sample, base_score, i, seeds)
+                for i, seeds in tasks
+            )
+
+            for i, feature_drops in results:
+                drops[i].extend(feature_drops)
+
+            still_active = []
+            for i in active:
+                n = len(drops[i])
+                t_critical = stats.t.ppf((1 + confidence) / 2, n - 1)
+                ci_half_width[i] = t_critical * np.std(drops[i], ddof=1) / np.sqrt(n)
+
+                if n < max_repeats and (n < min_repeats or ci_half_width[i] > ci_tolerance):
+                    still_active.append(i)
+            active = still_active
+
+    return {
+        'base_score': base_score,
+        'n_samples': len(sample_indices),
+        'importances_mean': np.array([np.mean(drops[i]) for i in range(n_features)]),
+        'importances_std': np.array([np.std(drops[i]) for i in range(n_features)]),
+        'ci_half_width': ci_half_width,
+        'n_repeats': np.array([len(drops[i]) for i in range(n_features)])
+    }
@@ -0,0 +1,242 @@
+import pandas as pd
+import numpy as np
+import json
+import time
+import copy
+import argparse
+import joblib
+from datetime import datetime
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, HistGradientBoostingClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.pipeline import Pipeline
+from sklearn.utils import _safe_indexing
+from train_ml_models import export_tree_model, evaluate_model_performance
+from tree_explainer import is_explainable
+from sampling import PriorCorrectedClassifier, SigmoidCalibratedClassifier, sampling_strata, downsample_negatives
+
+def load_refresh_artifacts():
+    """Load the current models, results and scaler"""
+    try:
+        trained_models = joblib.load('trained_models_latest.pkl')
+        model_results = joblib.load('model_results_latest.pkl')
+        scaler = joblib.load('scaler_latest.pkl')
+
+        with open('feature_names.json', 'r') as f:
+            feature_names = json.load(f)
+
+        return trained_models, model_results, scaler, feature_names
+    except FileNotFoundError:
+        print("Model files not found. Please run train_ml_models.py first.")
+        return None, None, None, None
+
+def split_recent_window(X, y, holdout_fraction=0.2):
+    """
+    Hold out the most recent rows of the new data for the guard.
+    Rows are expected in time order, oldest first.
+    """
+    n_holdout = max(int(len(X) * holdout_fraction), 1)
+    return X.iloc[:-n_holdout], X.iloc[-n_holdout:], y.iloc[:-n_holdout], y.iloc[-n_holdout:]
+
+def refresh_random_forest(model, X_new, y_new, new_trees=20, max_trees=None, random_state=None):
+    """
+    Grow new_trees on the new data with warm_start, then retire the oldest
+    trees beyond max_trees. warm_start skips one seed per existing tree,
+    and that count stays fixed once trees are retired, so every refresh
+    draws a new random_state (kept in the model's params).
+    """
+    model = copy.deepcopy(model)
+    max_trees = max_trees or len(model.estimators_)
+    if random_state is None:
+        random_state = int(np.random.SeedSequence().generate_state(1)[0])
+
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + new_trees, random_state=random_state)
+    model.fit(X_new, y_new)
+
+    # estimators_ is in fit order, so the oldest trees come first
+    model.estimators_ = model.estimators_[-max_trees:]
+    model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+    return model
+
+def refresh_gradient_boosting(model, X_new, y_new, new_stages=50):
+    """Continue boosting from the existing stages on the new data"""
+    model = copy.deepcopy(model)
+    model.set_params(warm_start=True, n_estimators=model.n_estimators_ + new_stages)
+    model.fit(X_new, y_new)
+    model.set_params(warm_start=False)
+    return model
+
+def refresh_hist_gradient_boosting(model, X_new, y_new, new_stages=50):
+    """Continue boosting from the existing iterations on the new data"""
+    model = copy.deepcopy(model)
+    model.set_params(warm_start=True, max_iter=model.n_iter_ + new_stages)
+    model.fit(X_new, y_new)
+    model.set_params(warm_start=False)
+    return model
+
+def refresh_partial_fit(model, X_new, y_new):
+    """Update a partial_fit-capable model in place (on a copy)"""
+    model = copy.deepcopy(model)
+    model.partial_fit(X_new, y_new)
+    return model
+
+def refresh_model(model, X_new, y_new, new_trees=20, max_trees=None, new_stages=50):
+    """Incrementally refreshed copy of model, or None if it has no incremental update"""
+    if isinstance(model, SigmoidCalibratedClassifier):
+        # The calibration split is not available here, so refreshing would leave it stale
+        return None
+    if isinstance(model, PriorCorrectedClassifier):
+        refreshed = refresh_model(model.estimator, X_new, y_new, new_trees, max_trees, new_stages)
+        return None if refreshed is None else PriorCorrectedClassifier(refreshed, model.negative_keep_rate)
+    if isinstance(model, Pipeline):
+        # Refresh the final estimator on the output of the (already fitted) earlier steps
+        refreshed = refresh_model(model[-1], model[:-1].transform(X_new), y_new, new_trees, max_trees, new_stages)
+        return None if refreshed is None else Pipeline(copy.deepcopy(model.steps[:-1]) + [(model.steps[-1][0], refreshed)])
+    if isinstance(model, RandomForestClassifier):
+        return refresh_random_forest(model, X_new, y_new, new_trees, max_trees)
+    if isinstance(model, GradientBoostingClassifier):
+        return refresh_gradient_boosting(model, X_new, y_new, new_stages)
+    if isinstance(model, HistGradientBoostingClassifier):
+        return refresh_hist_gradient_boosting(model, X_new, y_new, new_stages)
+    if hasattr(model, 'partial_fit'):
+        return refresh_partial_fit(model, X_new, y_new)
+    return None
+
+def refresh_models(trained_models, scaler, X_new, y_new, holdout_fraction=0.2, min_auc_delta=0.0,
+                   new_trees=20, max_trees=None, new_stages=50):
+    """
+    Refresh every model that supports an incremental update on the new data
+    only, and accept it if its AUC on the most recent window is no more than
+    min_auc_delta below the previous version. Models without an incremental
+    update are kept as they are. Models trained on negative-downsampled data
+    are refreshed on the new data downsampled at the same rate.
+
+    Every resulting model is evaluated on the recent window, so model
+    selection after a refresh compares current AUCs rather than the ones
+    from the last full training run.
+    """
+    X_fit, X_recent, y_fit, y_recent = split_recent_window(X_new, y_new, holdout_fraction)
+    X_fit_scaled = scaler.transform(X_fit)
+    X_recent_scaled = scaler.transform(X_recent)
+
+    refreshed_models = dict(trained_models)
+    model_results = {}
+    report = {}
+
+    for model_name, model_info in trained_models.items():
+        if model_info['scale_features']:
+            X_fit_model, X_recent_model = X_fit_scaled, X_recent_scaled
+        else:
+            X_fit_model, X_recent_model = X_fit, X_recent
+
+        start_time = time.time()
+        y_fit_model = y_fit
+        if isinstance(model_info['model'], PriorCorrectedClassifier):
+            keep, _ = downsample_negatives(y_fit, model_info['model'].negative_keep_rate, sampling_strata(X_fit))
+            X_fit_model, y_fit_model = _safe_indexing(X_fit_model, keep), y_fit.iloc[keep]
+
+        refreshed = refresh_model(model_info['model'], X_fit_model, y_fit_model, new_trees, max_trees, new_stages)
+        refresh_time = time.time() - start_time
+
+        if refreshed is None:
+            reason = 'no incremental update'
+            if isinstance(model_info['model'], SigmoidCalibratedClassifier):
+                reason = 'calibrated on a held-out split of the training data'
+            report[model_name] = {'status': 'kept', 'reason': reason}
+        else:
+            previous_auc = roc_auc_score(y_recent, model_info['model'].predict_proba(X_recent_model)[:, 1])
+            refreshed_auc = roc_auc_score(y_recent, refreshed.predict_proba(X_recent_model)[:, 1])
+            accepted = refreshed_auc >= previous_auc - min_auc_delta
+
+            report[model_name] = {
+                'status': 'refreshed' if accepted else 'rejected',
+                'previous_auc': float(previous_auc),
+                'refreshed_auc': float(refreshed_auc),
+                'refresh_time': refresh_time
+            }
+
+            if accepted:
+                refreshed_models[model_name] = {
+                    **model_info,
+                    'model': refreshed,
+                    'refreshed_at': datetime.now().isoformat(),
+                    'refresh_time': refresh_time
+                }
+
+        model_results[model_name] = evaluate_model_performance(
+            refreshed_models[model_name]['model'], X_recent_model, y_recent, model_name
+        )
+
+    return refreshed_models, model_results, report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally refresh trained models on new data")
+    parser.add_argument('--features', required=True, help="Feature CSV of the new transactions, in time order")
+    parser.add_argument('--labels', required=True, help="Label CSV of the new transactions")
+    parser.add_argument('--holdout-fraction', type=float, default=0.2,
+                        help="Most recent fraction of the new data used by the guard")
+    parser.add_argument('--min-auc-delta', type=float, default=0.0,
+                        help="Largest AUC drop on the recent window that still accepts a refresh")
+    parser.add_argument('--new-trees', type=int, default=20, help="Random Forest trees grown per refresh")
+    parser.add_argument('--max-trees', type=int, default=None,
+                        help="Random Forest size after retiring the oldest trees (defaults to the current size)")
+    parser.add_argument('--new-stages', type=int, default=50, help="Gradient Boosting stages added per refresh")
+    parser.add_argument('--append-history', action='store_true',
+                        help="Append the new data to features.csv/labels.csv for the next full retrain")
+    args = parser.parse_args()
+
+    trained_models, model_results, scaler, feature_names = load_refresh_artifacts()
+
+    if trained_models is not None:
+        X_new = pd.read_csv(args.features)[feature_names]
+        y_new = pd.read_csv(args.labels).squeeze()
+        print(f"Refreshing on {len(X_new)} new samples (fraud rate {y_new.mean():.2%})")
+
+        start_time = time.time()
+        refreshed_models, model_results, report = refresh_models(
+            trained_models, scaler, X_new, y_new, args.holdout_fraction, args.min_auc_delta,
+            args.new_trees, args.max_trees, args.new_stages
+        )
+        elapsed = time.time() - start_time
+
+        print("\nMODEL REFRESH")
+        print("=" * 50)
+        for model_name, result in report.items():
+            if result['status'] == 'kept':
+                print(f"{model_name}: kept ({result['reason']})")
+            else:
+                print(f"{model_name}: {result['status']} "
+                      f"(recent AUC {result['previous_auc']:.4f} -> {result['refreshed_auc']:.4f}, "
+                      f"{result['refresh_time']:.2f}s)")
+        print(f"\nTotal refresh time: {elapsed:.2f}s")
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        accepted = [name for name, result in report.items() if result['status'] == 'refreshed']
+
+        if accepted:
+            with open('model_metadata_latest.json', 'r') as f:
+                metadata = json.load(f)
+            metadata['timestamp'] = timestamp
+            metadata['best_model'] = max(model_results.items(), key=lambda x: x[1]['auc_score'])[0]
+
+            for suffix in [timestamp, 'latest']:
+                joblib.dump(refreshed_models, f'trained_models_{suffix}.pkl')
+                joblib.dump(model_results, f'model_results_{suffix}.pkl')
+                with open(f'model_metadata_{suffix}.json', 'w') as f:
+                    json.dump(metadata, f, indent=2)
+            print(f"Saved refreshed models to 'trained_models_latest.pkl' ({', '.join(accepted)}), "
+                  f"results re-evaluated on the recent window")
+
+            # Keep the exported tree model in sync with the refreshed artifacts
+            if any(is_explainable(refreshed_models[name]['model']) for name in accepted):
+                export_tree_model(refreshed_models, model_results, scaler, feature_names, timestamp, X_new)
+        else:
+            print("No refreshed model passed the guard; 'trained_models_latest.pkl' unchanged")
+
+        if args.append_history:
+            X_new.to_csv('features.csv', mode='a', header=False, index=False)
+            y_new.to_frame().to_csv('labels.csv', mode='a', header=False, index=False)
+            print(f"Appended {len(X_new)} samples to features.csv/labels.csv")
+
+        with open(f'refresh_report_{timestamp}.json', 'w') as f:
+            json.dump({'timestamp': timestamp, 'n_samples': len(X_new), 'elapsed': elapsed,
+                       'models': report}, f, indent=2)
@@ -0,0 +1,350 @@
+import pandas as pd
+import numpy as np
+import json
+import asyncio
+import argparse
+from urllib.parse import urlsplit
+from generate_transaction_data import generate_mobile_money_transactions
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram with fixed memory.
+
+    Values (microseconds) are bucketed log-linearly: each power of two is
+    split into `sub_buckets` linear buckets, so every recorded value keeps
+    a relative error below 1/sub_buckets regardless of magnitude.
+    Histograms merge by adding counts.
+    """
+
+    def __init__(self, sub_buckets=128, max_exponent=40):
+        self.sub_buckets = sub_buckets
+        self.counts = np.zeros((max_exponent + 1) * sub_buckets, dtype=np.int64)
+        self.total = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def _index(self, value):
+        value = max(value, 1.0)
+        exponent = int(np.floor(np.log2(value)))
+        sub_bucket = int((value / 2 ** exponent - 1) * self.sub_buckets)
+        return min(exponent * self.sub_buckets + sub_bucket, len(self.counts) - 1)
+
+    def _value(self, index):
+        exponent, sub_bucket = divmod(index, self.sub_buckets)
+        # Upper edge of the bucket, so percentiles never under-report
+        return 2 ** exponent * (1 + (sub_bucket + 1) / self.sub_buckets)
+
+    def record(self, value_us):
+        self.counts[self._index(value_us)] += 1
+        self.total += 1
+        self.sum += value_us
+        self.min = min(self.min, value_us)
+        self.max = max(self.max, value_us)
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.total += other.total
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, q):
+        if self.total == 0:
+            return 0.0
+        rank = int(np.ceil(q / 100 * self.total))
+        index = int(np.searchsorted(np.cumsum(self.counts), max(rank, 1)))
+        return min(self._value(index), self.max)
+
+    def summary_ms(self):
+        """Latency summary in milliseconds"""
+        if self.total == 0:
+            return {}
+        return {
+            'count': int(self.total),
+            'mean': self.sum / self.total / 1000,
+            'min': self.min / 1000,
+            'p50': self.percentile(50) / 1000,
+            'p95': self.percentile(95) / 1000,
+            'p99': self.percentile(99) / 1000,
+            'p999': self.percentile(99.9) / 1000,
+            'max': self.max / 1000
+        }
+
+class HttpConnectionPool:
+    """Minimal keep-alive HTTP/1.1 client on asyncio streams (JSON POST only)"""
+
+    def __init__(self, url, max_connections):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path or '/'
+        self.max_connections = max_connections
+        self.idle = asyncio.Queue()
+        self.opened = 0
+
+    async def _acquire(self):
+        if self.idle.empty() and self.opened < self.max_connections:
+            self.opened += 1
+            try:
+                return await asyncio.open_connection(self.host, self.port)
+            except BaseException:
+                # Includes CancelledError from a wait_for timeout, which would leak the slot
+                self.opened -= 1
+                raise
+        return await self.idle.get()
+
+    def _release(self, connection, reusable):
+        if reusable:
+            self.idle.put_nowait(connection)
+        else:
+            connection[1].close()
+            self.opened -= 1
+
+    async def post_json(self, payload):
+        """POST a JSON payload; returns (status_code, body_bytes)"""
+        body = json.dumps(payload).encode()
+        request = (
+            f"POST {self.path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode() + body
+
+        reader, writer = connection = await self._acquire()
+        reusable = False
+        try:
+            writer.write(request)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            status_code = int(status_line.split()[1])
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode().partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            if headers.get('transfer-encoding', '').lower() == 'chunked':
+                chunks = []
+                while True:
+                    size = int((await reader.readline()).strip(), 16)
+                    chunk = await reader.readexactly(size + 2)
+                    if size == 0:
+                        break
+                    chunks.append(chunk[:-2])
+                response_body = b''.join(chunks)
+            else:
+                response_body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            reusable = headers.get('connection', '').lower() != 'close'
+            return status_code, response_body
+        finally:
+            self._release(connection, reusable)
+
+    async def close(self):
+        while not self.idle.empty():
+            _, writer = self.idle.get_nowait()
+            writer.close()
+
+def build_payloads(df):
+    """Map generated transactions to the detect-fraud request schema"""
+    timestamps = pd.to_datetime(df['timestamp'])
+    user_counts = df['origin_user'].map(df['origin_user'].value_counts())
+
+    return [
+        {
+            'amount': str(row.amount),
+            'type': row.type,
+            'origin_country': row.origin_country,
+            'dest_country': row.dest_country,
+            'dest_user': row.dest_user,
+            'hour': str(row.hour),
+            'day_of_week': str(row.day_of_week),
+            'origin_balance': str(row.origin_balance_before),
+            'dest_balance': str(row.dest_balance_before),
+            'user_transaction_count': str(row.user_transaction_count)
+        }
+        for row in df.assign(
+            hour=timestamps.dt.hour,
+            day_of_week=timestamps.dt.dayofweek,
+            user_transaction_count=user_counts
+        ).itertuples()
+    ]
+
+def build_schedule(df, tps=None, time_compression=None, fraud_burst_size=1):
+    """
+    Send order (row positions) and send offsets (seconds from start) for
+    timestamp-ordered transactions.
+
+    With tps, arrivals are evenly spaced at the target rate; with
+    time_compression, the original inter-arrival gaps are divided by the
+    factor. fraud_burst_size > 1 groups consecutive fraudulent transactions
+    into bursts that arrive at the same instant. Bursts pull later rows
+    forward, so rows are stably re-sorted by offset.
+    """
+    if tps is not None:
+        offsets = np.arange(len(df)) / tps
+    else:
+        timestamps = pd.to_datetime(df['timestamp'])
+        offsets = ((timestamps - timestamps.iloc[0]).dt.total_seconds() / time_compression).values
+
+    offsets = np.asarray(offsets, dtype=float)
+
+    if fraud_burst_size > 1:
+        fraud_positions = np.flatnonzero(df['is_fraud'].values == 1)
+        burst_starts = fraud_positions[(np.arange(len(fraud_positions)) // fraud_burst_size) * fraud_burst_size]
+        offsets[fraud_positions] = offsets[burst_starts]
+
+    order = np.argsort(offsets, kind='stable')
+    return order, offsets[order]
+
+async def run_replay(url, payloads, offsets, is_fraud, max_connections=64, max_in_flight=10000, timeout=10.0):
+    """
+    Open-loop replay: each request is sent at its scheduled time whether or
+    not earlier requests have completed. Latency is measured from the
+    scheduled time, so queueing delay in the client is counted too.
+    """
+    pool = HttpConnectionPool(url, max_connections)
+    histogram = LatencyHistogram()
+    fraud_histogram = LatencyHistogram()
+    status_counts = {}
+    errors = {'timeout': 0, 'connection': 0, 'client_overload': 0}
+    in_flight = 0
+    tasks = set()
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def send(payload, scheduled, fraud):
+        nonlocal in_flight
+        in_flight += 1
+        try:
+            status_code, _ = await asyncio.wait_for(pool.post_json(payload), timeout)
+            latency_us = (loop.time() - scheduled) * 1e6
+            status_counts[status_code] = status_counts.get(status_code, 0) + 1
+            histogram.record(latency_us)
+            if fraud:
+                fraud_histogram.record(latency_us)
+        except asyncio.TimeoutError:
+            errors['timeout'] += 1
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            errors['connection'] += 1
+        finally:
+            in_flight -= 1
+
+    for payload, offset, fraud in zip(payloads, offsets, is_fraud):
+        scheduled = start + offset
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if in_flight >= max_in_flight:
+            errors['client_overload'] += 1
+            continue
+
+        task = asyncio.create_task(send(payload, scheduled, fraud))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+    await pool.close()
+
+    n_requests = len(payloads)
+    n_errors = sum(errors.values()) + sum(c for s, c in status_counts.items() if s >= 400)
+
+    return {
+        'requests': n_requests,
+        'elapsed_seconds': elapsed,
+        'offered_tps': n_requests / max(offsets.max(), 1e-9) if n_requests > 1 else 0.0,
+        'throughput_tps': histogram.total / elapsed if elapsed > 0 else 0.0,
+        'error_rate': n_errors / n_requests if n_requests else 0.0,
+        'errors': errors,
+        'status_codes': {str(k): v for k, v in status_counts.items()},
+        'latency_ms': histogram.summary_ms(),
+        'fraud_latency_ms': fraud_histogram.summary_ms()
+    }
+
+def print_step(result, label):
+    latency = result['latency_ms']
+    print(f"{label}: offered {result['offered_tps']:.0f} tps, achieved {result['throughput_tps']:.0f} tps, "
+          f"errors {result['error_rate']:.2%}")
+    if latency:
+        print(f"  latency ms  p50={latency['p50']:.1f}  p95={latency['p95']:.1f}  "
+              f"p99={latency['p99']:.1f}  p999={latency['p999']:.1f}  max={latency['max']:.1f}")
+
+def find_saturation_point(results, slo_p99_ms):
+    """First rate where throughput falls behind the offered load or p99 breaks the SLO"""
+    for result in results:
+        behind = result['throughput_tps'] < 0.95 * result['offered_tps']
+        slow = result['latency_ms'].get('p99', float('inf')) > slo_p99_ms
+        if behind or slow or result['error_rate'] > 0.01:
+            return result['offered_tps']
+    return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay generated transactions against a scoring endpoint")
+    parser.add_argument('--url', default='http://localhost:3000/api/detect-fraud', help="Scoring endpoint")
+    parser.add_argument('--input', default='transaction_data_raw.csv',
+                        help="Transactions from generate_mobile_money_transactions (generated if missing)")
+    parser.add_argument('--num-transactions', type=int, default=10000, help="Rows to generate when --input is missing")
+    parser.add_argument('--tps', default=None,
+                        help="Target rate; a comma-separated list runs a sweep (e.g. 50,100,200,400)")
+    parser.add_argument('--time-compression', type=float, default=None,
+                        help="Replay the original timestamps sped up by this factor")
+    parser.add_argument('--fraud-burst-size', type=int, default=1, help="Send fraud transactions in bursts of this size")
+    parser.add_argument('--max-connections', type=int, default=64, help="Concurrent keep-alive connections")
+    parser.add_argument('--max-in-flight', type=int, default=10000, help="Outstanding requests before shedding")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Per-request timeout in seconds")
+    parser.add_argument('--slo-p99-ms', type=float, default=100.0, help="p99 latency target for the sweep")
+    parser.add_argument('--output', default='load_test_results.json', help="Results file")
+    args = parser.parse_args()
+
+    try:
+        df = pd.read_csv(args.input)
+    except FileNotFoundError:
+        print(f"{args.input} not found, generating {args.num_transactions} transactions...")
+        df = generate_mobile_money_transactions(args.num_transactions)
+
+    df = df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+    payloads = build_payloads(df)
+    is_fraud = df['is_fraud'].values == 1
+
+    if args.tps is not None:
+        steps = [('tps', float(rate)) for rate in args.tps.split(',')]
+    else:
+        steps = [('time_compression', args.time_compression or 3600.0)]
+
+    results = []
+    for mode, value in steps:
+        order, offsets = build_schedule(
+            df,
+            tps=value if mode == 'tps' else None,
+            time_compression=value if mode == 'time_compression' else None,
+            fraud_burst_size=args.fraud_burst_size
+        )
+        result = asyncio.run(run_replay(
+            args.url, [payloads[i] for i in order], offsets, is_fraud[order],
+            max_connections=args.max_connections, max_in_flight=args.max_in_flight, timeout=args.timeout
+        ))
+        result[mode] = value
+        results.append(result)
+        print_step(result, f"{mode}={value:g}")
+
+    if len(results) > 1:
+        saturation = find_saturation_point(results, args.slo_p99_ms)
+        if saturation is None:
+            print("\nNo saturation within the tested rates")
+        else:
+            print(f"\nSaturation point: ~{saturation:.0f} tps")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to '{args.output}'")
@@ -0,0 +1,186 @@
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.naive_bayes import GaussianNB
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.utils import _safe_indexing
+
+# Width of the time-of-day buckets used for stratification
+TIME_BUCKET_HOURS = 6
+
+def sampling_strata(X):
+    """Stratum of every row: transaction type x day of week x time-of-day bucket"""
+    type_columns = [col for col in X.columns if col.startswith('type_')]
+    types = X[type_columns].values.argmax(axis=1) if type_columns else np.zeros(len(X), dtype=int)
+    days = X['day_of_week'].values.astype(int) if 'day_of_week' in X.columns else np.zeros(len(X), dtype=int)
+    buckets = X['hour'].values.astype(int) // TIME_BUCKET_HOURS if 'hour' in X.columns else np.zeros(len(X), dtype=int)
+
+    n_buckets = 24 // TIME_BUCKET_HOURS
+    return (types * 7 + days) * n_buckets + buckets
+
+def negative_keep_rate(y, negative_ratio):
+    """Fraction of negatives to keep for negative_ratio negatives per positive"""
+    y = np.asarray(y)
+    n_positive = (y == 1).sum()
+    n_negative = (y == 0).sum()
+    return min(1.0, negative_ratio * n_positive / max(n_negative, 1))
+
+def downsample_negatives(y, keep_rate, strata=None, random_state=42):
+    """
+    Row positions of every positive plus keep_rate of the negatives in each
+    stratum, and the effective keep rate after per-stratum rounding.
+    """
+    y = np.asarray(y)
+    strata = np.zeros(len(y), dtype=int) if strata is None else np.asarray(strata)
+    rng = np.random.default_rng(random_state)
+
+    keep = [np.flatnonzero(y == 1)]
+    for stratum in np.unique(strata[y == 0]):
+        negatives = np.flatnonzero((y == 0) & (strata == stratum))
+        n_keep = int(round(len(negatives) * keep_rate))
+        keep.append(rng.choice(negatives, n_keep, replace=False))
+
+    keep = np.sort(np.concatenate(keep))
+    effective_rate = (y[keep] == 0).sum() / max((y == 0).sum(), 1)
+    return keep, float(effective_rate)
+
+# Families whose predict_proba estimates the posterior of the distribution
+# they were trained on (log-loss fits, naive Bayes, neighbour votes)
+POSTERIOR_MODELS = (GradientBoostingClassifier, HistGradientBoostingClassifier, LogisticRegression,
+                    GaussianNB, KNeighborsClassifier)
+
+def prior_correction(estimator):
+    """
+    How a model of this family trained on negative-downsampled data is
+    mapped back to the true base rate:
+
+    - 'shift': posterior estimators trained without class weights; the
+      log r shift of PriorCorrectedClassifier is exact
+    - 'calibrate': everything else. SVC and AdaBoost scores are not
+      posteriors, and class weights move probabilities with the sampled
+      prior in a model-dependent way. These get SigmoidCalibratedClassifier
+      fitted on a split that was not downsampled.
+
+    Checked on held-out data against the true fraud rate: the shift brings
+    GB and NB back to it and kNN (coarse vote fractions) most of the way;
+    only calibration does for RF, DT, HGB and LR with balanced class
+    weights, SVC and AdaBoost.
+    """
+    if isinstance(estimator, Pipeline):
+        estimator = estimator[-1]
+
+    if isinstance(estimator, POSTERIOR_MODELS) and getattr(estimator, 'class_weight', None) is None:
+        return 'shift'
+    return 'calibrate'
+
+class _WrappedClassifier(ClassifierMixin, BaseEstimator):
+    """Wrapper around a fitted binary classifier that delegates everything it does not override"""
+
+    def __init__(self, estimator):
+        self.estimator = estimator
+
+    @property
+    def classes_(self):
+        return self.estimator.classes_
+
+    def predict(self, X):
+        return self.classes_[(self.predict_proba(X)[:, 1] > 0.5).astype(int)]
+
+    def __getattr__(self, name):
+        # Only called for attributes not found on the wrapper itself
+        if name.startswith('__') or name == 'estimator':
+            raise AttributeError(name)
+        return getattr(self.estimator, name)
+
+class PriorCorrectedClassifier(_WrappedClassifier):
+    """
+    Classifier trained on negative-downsampled data, with predict_proba
+    mapped back to the true base rate:
+
+        p = p_s / (p_s + (1 - p_s) / r)
+
+    where p_s is the probability under the sampled distribution and r the
+    fraction of negatives kept (in log-odds: logit(p) = logit(p_s) + log r).
+    fit() downsamples the negatives of X to r before refitting, so a clone
+    refit on full data gets the sampled distribution the shift assumes.
+    Other attributes (feature_importances_, coef_, ...) are read from the
+    wrapped estimator.
+    """
+
+    def __init__(self, estimator, negative_keep_rate=1.0, random_state=42):
+        self.estimator = estimator
+        self.negative_keep_rate = negative_keep_rate
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        y = np.asarray(y)
+        rows = np.arange(len(y))
+        if self.negative_keep_rate < 1.0:
+            rows, _ = downsample_negatives(y, self.negative_keep_rate, random_state=self.random_state)
+
+        self.estimator.fit(_safe_indexing(X, rows), y[rows])
+        return self
+
+    def predict_proba(self, X):
+        sampled = self.estimator.predict_proba(X)[:, 1]
+        corrected = sampled / (sampled + (1 - sampled) / self.negative_keep_rate)
+        return np.column_stack([1 - corrected, corrected])
+
+class SigmoidCalibratedClassifier(_WrappedClassifier):
+    """
+    Classifier whose probabilities come from Platt scaling of its scores
+    (decision_function, or predict_proba where there is none), fitted with
+    calibrate() on data the estimator was not trained on. When that split
+    is at the true base rate, the calibrated probabilities are too, however
+    the estimator's own training data was sampled.
+
+    fit() refits both on X: the estimator on a stratified split, with its
+    negatives downsampled to negative_keep_rate as in training, and the
+    sigmoid on the remaining calibration_size, which is not downsampled.
+    """
+
+    def __init__(self, estimator, negative_keep_rate=1.0, calibration_size=0.2, random_state=42):
+        self.estimator = estimator
+        self.negative_keep_rate = negative_keep_rate
+        self.calibration_size = calibration_size
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        y = np.asarray(y)
+        fit_rows, calibration_rows = train_test_split(
+            np.arange(len(y)), test_size=self.calibration_size, random_state=self.random_state, stratify=y
+        )
+        if self.negative_keep_rate < 1.0:
+            keep, _ = downsample_negatives(y[fit_rows], self.negative_keep_rate, random_state=self.random_state)
+            fit_rows = fit_rows[keep]
+
+        self.estimator.fit(_safe_indexing(X, fit_rows), y[fit_rows])
+        return self.calibrate(_safe_indexing(X, calibration_rows), y[calibration_rows])
+
+    def _scores(self, X):
+        if hasattr(self.estimator, 'decision_function'):
+            return np.asarray(self.estimator.decision_function(X)).reshape(-1, 1)
+        return self.estimator.predict_proba(X)[:, 1].reshape(-1, 1)
+
+    def calibrate(self, X, y):
+        """Fit the sigmoid on a held-out split"""
+        self.calibrator_ = LogisticRegression(C=1e6).fit(self._scores(X), y)
+        return self
+
+    def predict_proba(self, X):
+        return self.calibrator_.predict_proba(self._scores(X))
+
+def base_estimator(model):
+    """Estimator inside a prior-correction or calibration wrapper"""
+    if isinstance(model, _WrappedClassifier):
+        return model.estimator
+    return model
+
+def unwrap_model(model):
+    """Underlying estimator and the negative keep rate its probabilities are corrected for"""
+    if isinstance(model, PriorCorrectedClassifier):
+        return model.estimator, model.negative_keep_rate
+    return model, 1.0
@@ -0,0 +1,262 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import time
+import sqlite3
+import hashlib
+from datetime import datetime
+import sklearn
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import ParameterGrid
+from sklearn.utils import _safe_indexing
+
+def _json_key(value):
+    return json.dumps(value, sort_keys=True, default=repr)
+
+def estimator_key(estimator, param_grid):
+    """scikit-learn version, estimator class and every fixed (non-searched) parameter"""
+    searched = set(param_grid)
+    fixed_params = {k: v for k, v in estimator.get_params(deep=False).items() if k not in searched}
+    return (f"sklearn-{sklearn.__version__}:{type(estimator).__module__}.{type(estimator).__name__}:"
+            f"{_json_key(fixed_params)}")
+
+def data_fingerprint(X, y):
+    """Content hash of the training data"""
+    digest = hashlib.sha1()
+
+    if isinstance(X, pd.DataFrame):
+        digest.update(pd.util.hash_pandas_object(X, index=False).values.tobytes())
+        digest.update(_json_key(list(X.columns)).encode())
+    else:
+        X = np.ascontiguousarray(X)
+        digest.update(str(X.shape).encode())
+        digest.update(X.tobytes())
+
+    digest.update(np.ascontiguousarray(np.asarray(y)).tobytes())
+    return digest.hexdigest()
+
+def cv_fingerprint(splits, scoring):
+    """Hash of the fold test indices and the scoring metric"""
+    digest = hashlib.sha1(str(scoring).encode())
+    for _, test in splits:
+        digest.update(np.asarray(test, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+class SearchCache:
+    """
+    Persistent per-candidate, per-fold cross-validation results.
+
+    Rows are keyed by (estimator, params, data fingerprint, CV split, fold),
+    so a search only has to evaluate candidates it has not seen on the same
+    data and split. Only successful fits are stored, so a failed candidate
+    is retried on the next search. Fit times are kept for every row and
+    used by estimate_search_cost.
+    """
+
+    def __init__(self, path='search_cache.sqlite'):
+        self.path = path
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS fold_results (
+                    estimator_key TEXT,
+                    params_key TEXT,
+                    data_fingerprint TEXT,
+                    cv_fingerprint TEXT,
+                    fold INTEGER,
+                    n_train INTEGER,
+                    score REAL,
+                    fit_time REAL,
+                    score_time REAL,
+                    created_at TEXT,
+                    PRIMARY KEY (estimator_key, params_key, data_fingerprint, cv_fingerprint, fold)
+                )
+            """)
+
+    def lookup(self, est_key, data_fp, cv_fp):
+        """Cached fold results for one estimator on one dataset/split"""
+        with sqlite3.connect(self.path) as conn:
+            rows = conn.execute(
+                "SELECT params_key, fold, score, fit_time FROM fold_results "
+                "WHERE estimator_key = ? AND data_fingerprint = ? AND cv_fingerprint = ? AND score IS NOT NULL",
+                (est_key, data_fp, cv_fp)
+            ).fetchall()
+
+        return {(params_key, fold): (score, fit_time) for params_key, fold, score, fit_time in rows}
+
+    def store(self, records):
+        """Insert fold results: (est_key, params_key, data_fp, cv_fp, fold, n_train, score, fit_time, score_time)"""
+        created_at = datetime.now().isoformat()
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO fold_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [record + (created_at,) for record in records]
+            )
+
+    def fit_time_history(self, est_key):
+        """Every recorded fit for an estimator, on any dataset"""
+        with sqlite3.connect(self.path) as conn:
+            return pd.read_sql_query(
+                "SELECT params_key, n_train, fit_time FROM fold_results "
+                "WHERE estimator_key = ? AND score IS NOT NULL",
+                conn, params=(est_key,)
+            )
+
+def _fit_and_score(estimator, params, X, y, train, test, scorer):
+    """Fit one candidate on one fold; returns (score, fit_time, score_time)"""
+    X_train, X_test = _safe_indexing(X, train), _safe_indexing(X, test)
+    y_train, y_test = _safe_indexing(y, train), _safe_indexing(y, test)
+
+    start_time = time.time()
+    try:
+        # Parameters this sklearn version rejects fail here, like a failed fit
+        model = clone(estimator).set_params(**params)
+        model.fit(X_train, y_train)
+    except Exception:
+        # Same as GridSearchCV's error_score=np.nan
+        return np.nan, time.time() - start_time, 0.0
+    fit_time = time.time() - start_time
+
+    start_time = time.time()
+    score = scorer(model, X_test, y_test)
+    return score, fit_time, time.time() - start_time
+
+class CachedSearchResult:
+    """Subset of the GridSearchCV interface used by train_models_with_tuning"""
+
+    def __init__(self, best_estimator, best_params, best_score, cv_results, n_evaluated, n_cached, refit_time):
+        self.best_estimator_ = best_estimator
+        self.best_params_ = best_params
+        self.best_score_ = best_score
+        self.cv_results_ = cv_results
+        self.n_evaluated = n_evaluated
+        self.n_cached = n_cached
+        self.refit_time_ = refit_time
+
+def cached_grid_search(estimator, param_grid, X, y, cv, scoring='roc_auc', n_jobs=-1, cache=None):
+    """
+    Exhaustive grid search that only evaluates (candidate, fold) pairs
+    missing from the cache, then refits the best candidate on all data.
+    """
+    cache = cache or SearchCache()
+    candidates = list(ParameterGrid(param_grid))
+    splits = list(cv.split(X, y))
+
+    est_key = estimator_key(estimator, param_grid)
+    data_fp = data_fingerprint(X, y)
+    cv_fp = cv_fingerprint(splits, scoring)
+    scorer = check_scoring(estimator, scoring=scoring)
+
+    cached = cache.lookup(est_key, data_fp, cv_fp)
+    missing = [(i, fold) for i, params in enumerate(candidates) for fold in range(len(splits))
+               if (_json_key(params), fold) not in cached]
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_and_score)(estimator, candidates[i], X, y, *splits[fold], scorer)
+        for i, fold in missing
+    )
+
+    records = []
+    for (i, fold), (score, fit_time, score_time) in zip(missing, results):
+        params_key = _json_key(candidates[i])
+        cached[(params_key, fold)] = (score, fit_time)
+        # Failed fits (NaN) count in this search but are not persisted
+        if not np.isnan(score):
+            records.append((est_key, params_key, data_fp, cv_fp, fold, len(splits[fold][0]),
+                            float(score), fit_time, score_time))
+    cache.store(records)
+
+    n_folds = len(splits)
+    fold_scores = np.array([[cached[(_json_key(p), fold)][0] for fold in range(n_folds)] for p in candidates])
+    fit_times = np.array([[cached[(_json_key(p), fold)][1] for fold in range(n_folds)] for p in candidates])
+
+    mean_scores = fold_scores.mean(axis=1)
+    cv_results = {
+        'params': candidates,
+        'mean_test_score': mean_scores,
+        'std_test_score': fold_scores.std(axis=1),
+        'mean_fit_time': fit_times.mean(axis=1)
+    }
+    for fold in range(n_folds):
+        cv_results[f'split{fold}_test_score'] = fold_scores[:, fold]
+
+    if np.isnan(mean_scores).all():
+        raise ValueError(f"All {len(candidates) * n_folds} fits of {type(estimator).__name__} failed; "
+                         "check the parameter grid against the installed scikit-learn")
+
+    # Failed candidates (NaN) rank last, as in GridSearchCV
+    best_index = int(np.nanargmax(mean_scores))
+    best_params = candidates[best_index]
+    start_time = time.time()
+    best_estimator = clone(estimator).set_params(**best_params).fit(X, y)
+    refit_time = time.time() - start_time
+
+    return CachedSearchResult(
+        best_estimator, best_params, float(mean_scores[best_index]), cv_results,
+        n_evaluated=len(missing), n_cached=len(candidates) * n_folds - len(missing),
+        refit_time=refit_time
+    )
+
+def estimate_search_cost(estimator, param_grid, X, y, cv, scoring='roc_auc', n_jobs=-1, cache=None):
+    """
+    Predict the fit time of the (candidate, fold) pairs a search would
+    still have to evaluate, from fit times stored for the same estimator.
+
+    A candidate with history uses its own fit times; otherwise the
+    candidates sharing the most parameter values are used. Times are
+    scaled linearly with training rows and with n_estimators / max_iter
+    where those differ. estimated_wall_seconds is None when none of the
+    missing fits has any history to go on.
+    """
+    cache = cache or SearchCache()
+    candidates = list(ParameterGrid(param_grid))
+    splits = list(cv.split(X, y))
+
+    est_key = estimator_key(estimator, param_grid)
+    cached = cache.lookup(est_key, data_fingerprint(X, y), cv_fingerprint(splits, scoring))
+    history = cache.fit_time_history(est_key)
+
+    n_train = int(np.mean([len(train) for train, _ in splits]))
+    total_seconds = 0.0
+    n_missing = 0
+    n_without_history = 0
+
+    if len(history) > 0:
+        history['params'] = history['params_key'].map(json.loads)
+        history['seconds_per_row'] = history['fit_time'] / history['n_train'].clip(lower=1)
+
+    for params in candidates:
+        n_candidate_missing = sum((_json_key(params), fold) not in cached for fold in range(len(splits)))
+        if n_candidate_missing == 0:
+            continue
+        n_missing += n_candidate_missing
+
+        if len(history) == 0:
+            n_without_history += n_candidate_missing
+            continue
+
+        similarity = history['params'].map(lambda p: sum(p.get(k) == v for k, v in params.items()))
+        nearest = history[similarity == similarity.max()]
+
+        seconds = nearest['seconds_per_row'].median() * n_train
+        for size_param in ('n_estimators', 'max_iter'):
+            if size_param in params:
+                reference = nearest['params'].map(lambda p: p.get(size_param)).dropna()
+                if len(reference) > 0 and isinstance(params[size_param], (int, float)):
+                    seconds *= params[size_param] / reference.median()
+
+        total_seconds += seconds * n_candidate_missing
+
+    n_workers = n_jobs if n_jobs and n_jobs > 0 else os.cpu_count()
+    estimated_wall_seconds = None
+    if n_without_history < n_missing:
+        estimated_wall_seconds = float(total_seconds / max(min(n_workers, n_missing), 1))
+
+    return {
+        'n_missing_fits': n_missing,
+        'n_fits_without_history': n_without_history,
+        'total_fit_seconds': float(total_seconds),
+        'estimated_wall_seconds': estimated_wall_seconds
+    }
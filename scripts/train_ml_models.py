@@ -1,23 +1,39 @@
 import pandas as pd
 import numpy as np
 import json
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV, StratifiedKFold
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, AdaBoostClassifier
+import time
+import argparse
+from sklearn.base import clone
+from sklearn.utils import _safe_indexing
+from sklearn.model_selection import train_test_split, cross_val_score, StratifiedKFold
+from sklearn.ensemble import (RandomForestClassifier, GradientBoostingClassifier, AdaBoostClassifier,
+                              HistGradientBoostingClassifier)
 from sklearn.linear_model import LogisticRegression
-from sklearn.svm import SVC
+from sklearn.svm import SVC, NuSVC
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.naive_bayes import GaussianNB
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.preprocessing import StandardScaler
+from sklearn.pipeline import Pipeline
 from sklearn.metrics import (classification_report, confusion_matrix, roc_auc_score, 
                            roc_curve, precision_recall_curve, f1_score, precision_score, 
                            recall_score, accuracy_score)
 from sklearn.utils.class_weight import compute_class_weight
 import joblib
+from joblib import Parallel, delayed
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
 import warnings
+from drift_monitor import build_drift_reference, save_drift_reference
+from permutation_importance import compute_permutation_importance
+from tree_explainer import TreeExplainer, RISK_FACTOR_LABELS, is_explainable
+from verify_model_export import verify_export_parity, write_export_fixture
+from search_cache import SearchCache, cached_grid_search, estimate_search_cost
+from categorical_features import TransactionTypeEncoder
+from graph_features import GRAPH_FEATURE_PREFIXES
+from sampling import (sampling_strata, negative_keep_rate, downsample_negatives, prior_correction,
+                      PriorCorrectedClassifier, SigmoidCalibratedClassifier, base_estimator, unwrap_model)
 warnings.filterwarnings('ignore')
 
 def load_data():
@@ -58,6 +74,31 @@ def get_model_configurations():
             },
             'scale_features': False
         },
+        'Histogram Gradient Boosting': {
+            # Binned splits with early stopping on an internal validation split;
+            # transaction type is passed as a native categorical column
+            'model': Pipeline([
+                ('encode', TransactionTypeEncoder()),
+                ('hgb', HistGradientBoostingClassifier(
+                    random_state=42,
+                    class_weight='balanced',
+                    categorical_features='from_dtype',
+                    max_iter=500,
+                    early_stopping=True,
+                    validation_fraction=0.1,
+                    n_iter_no_change=10,
+                    scoring='roc_auc'
+                ))
+            ]),
+            'params': {
+                'hgb__learning_rate': [0.05, 0.1],
+                'hgb__max_leaf_nodes': [15, 31, 63],
+                'hgb__l2_regularization': [0.0, 1.0]
+            },
+            'scale_features': False,
+            # Each fit is multi-threaded (OpenMP), so run candidates sequentially
+            'search_n_jobs': 1
+        },
         'Logistic Regression': {
             'model': LogisticRegression(random_state=42, class_weight='balanced', max_iter=1000),
             'params': {
@@ -90,8 +131,7 @@ def get_model_configurations():
             'model': AdaBoostClassifier(random_state=42),
             'params': {
                 'n_estimators': [50, 100, 200],
-                'learning_rate': [0.01, 0.1, 1.0],
-                'algorithm': ['SAMME', 'SAMME.R']
+                'learning_rate': [0.01, 0.1, 1.0]
             },
             'scale_features': False
         },
@@ -115,14 +155,67 @@ def get_model_configurations():
     
     return model_configs
 
-def evaluate_model_performance(model, X_test, y_test, model_name):
-    """Comprehensive model evaluation"""
+def _predict_chunk(model, X_chunk, method):
+    if method == 'predict_proba':
+        return model.predict_proba(X_chunk)[:, 1]
+    return getattr(model, method)(X_chunk)
+
+def predict_proba_chunked(model, X, chunk_size=10000, n_jobs=1, method='predict_proba'):
+    """Fraud probabilities computed in bounded-size chunks
+    
+    Peak inference memory depends on chunk_size, not on len(X); with
+    n_jobs != 1 the chunks are spread across joblib workers. Any other
+    method (e.g. 'decision_function') returns that method's output instead.
+    """
+    n_samples = X.shape[0]
+    bounds = [(start, min(start + chunk_size, n_samples)) for start in range(0, n_samples, chunk_size)]
+    take = (lambda start, end: X.iloc[start:end]) if isinstance(X, pd.DataFrame) else (lambda start, end: X[start:end])
+    
+    y_pred_proba = np.empty(n_samples)
+    
+    if n_jobs == 1:
+        for start, end in bounds:
+            y_pred_proba[start:end] = _predict_chunk(model, take(start, end), method)
+    else:
+        chunks = Parallel(n_jobs=n_jobs)(
+            delayed(_predict_chunk)(model, take(start, end), method) for start, end in bounds
+        )
+        for (start, end), chunk in zip(bounds, chunks):
+            y_pred_proba[start:end] = chunk
     
-    y_pred = model.predict(X_test)
-    y_pred_proba = model.predict_proba(X_test)[:, 1]
+    return y_pred_proba
+
+def predict_matches_proba(model):
+    """Whether predict() is the argmax of predict_proba()
+    
+    libsvm's SVC/NuSVC predict from the sign of the decision function,
+    while their probabilities come from a separately fitted Platt scaling
+    (with its own internal cross-validation), so the two can disagree.
+    """
+    return not isinstance(model, (SVC, NuSVC))
+
+def evaluate_model_performance(model, X_test, y_test, model_name, threshold=0.5, chunk_size=10000, n_jobs=1):
+    """Comprehensive model evaluation
+    
+    Runs a single inference pass: labels are derived from the predicted
+    probabilities at `threshold` instead of a separate predict() call.
+    For SVC/NuSVC the pass is decision_function: the default labels are
+    its sign, as in predict(), and the probabilities are the fitted Platt
+    sigmoid (probA_, probB_) applied to it.
+    """
+    
+    if predict_matches_proba(model):
+        y_pred_proba = predict_proba_chunked(model, X_test, chunk_size=chunk_size, n_jobs=n_jobs)
+        y_pred = (y_pred_proba > threshold).astype(int)
+    else:
+        decision = predict_proba_chunked(model, X_test, chunk_size=chunk_size, n_jobs=n_jobs,
+                                         method='decision_function')
+        y_pred_proba = 1.0 / (1.0 + np.exp(model.probA_[0] * decision - model.probB_[0]))
+        y_pred = (decision > 0 if threshold == 0.5 else y_pred_proba > threshold).astype(int)
     
     # Calculate comprehensive metrics
     metrics = {
+        'threshold': threshold,
         'accuracy': accuracy_score(y_test, y_pred),
         'precision': precision_score(y_test, y_pred),
         'recall': recall_score(y_test, y_pred),
@@ -142,8 +235,17 @@ def evaluate_model_performance(model, X_test, y_test, model_name):
     
     return metrics
 
-def train_models_with_tuning(X, y, feature_names):
-    """Train multiple models with hyperparameter tuning"""
+def train_models_with_tuning(X, y, feature_names, negative_ratio=None):
+    """Train multiple models with hyperparameter tuning
+    
+    With negative_ratio, the training split keeps every fraud case and
+    negative_ratio legitimate transactions per fraud case, sampled evenly
+    across type and time strata. Each model family is then mapped back to
+    the true base rate as sampling.prior_correction prescribes: shifted
+    with PriorCorrectedClassifier, or trained without a held-out 20% of the
+    training split and calibrated on it at the true base rate with
+    SigmoidCalibratedClassifier. The test split is never downsampled.
+    """
     
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(
@@ -155,12 +257,30 @@ def train_models_with_tuning(X, y, feature_names):
     X_train_scaled = scaler.fit_transform(X_train)
     X_test_scaled = scaler.transform(X_test)
     
+    # Downsample negatives after fitting the scaler on the full training split
+    keep_rate = 1.0
+    if negative_ratio:
+        keep, keep_rate = downsample_negatives(
+            y_train, negative_keep_rate(y_train, negative_ratio), sampling_strata(X_train)
+        )
+        print(f"Negative downsampling: {len(y_train)} -> {len(keep)} training samples "
+              f"(negative keep rate {keep_rate:.4f})")
+        
+        # Calibration split at the true base rate, left out of the calibrated models' training data
+        fit_rows, calibration_rows = train_test_split(
+            np.arange(len(y_train)), test_size=0.2, random_state=42, stratify=y_train
+        )
+        keep_fit = np.intersect1d(keep, fit_rows)
+    
     # Get model configurations
     model_configs = get_model_configurations()
     
     trained_models = {}
     model_results = {}
     
+    # Persistent per-candidate, per-fold CV results shared across runs
+    search_cache = SearchCache()
+    
     print("Training models with hyperparameter tuning...")
     print("=" * 60)
     
@@ -174,34 +294,58 @@ def train_models_with_tuning(X, y, feature_names):
         else:
             X_train_model = X_train
             X_test_model = X_test
+        y_train_model = y_train
         
-        # Perform grid search with cross-validation
+        correction = prior_correction(config['model']) if keep_rate < 1.0 else None
+        if correction is not None:
+            X_calibration = _safe_indexing(X_train_model, calibration_rows)
+            y_calibration = y_train.iloc[calibration_rows]
+            rows = keep_fit if correction == 'calibrate' else keep
+            X_train_model, y_train_model = _safe_indexing(X_train_model, rows), y_train.iloc[rows]
+        
+        # Perform grid search with cross-validation, reusing cached fold results
         cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
         
-        grid_search = GridSearchCV(
+        cost = estimate_search_cost(config['model'], config['params'], X_train_model, y_train_model, cv,
+                                    n_jobs=config.get('search_n_jobs', -1), cache=search_cache)
+        if cost['n_missing_fits'] > 0 and cost['estimated_wall_seconds'] is None:
+            print(f"Fits to run: {cost['n_missing_fits']} (estimated time unknown, no fit history)")
+        elif cost['n_missing_fits'] > 0:
+            print(f"Fits to run: {cost['n_missing_fits']} (estimated ~{cost['estimated_wall_seconds']:.0f}s"
+                  f"{', partly unknown' if cost['n_fits_without_history'] else ''})")
+        
+        grid_search = cached_grid_search(
             estimator=config['model'],
             param_grid=config['params'],
+            X=X_train_model,
+            y=y_train_model,
             cv=cv,
             scoring='roc_auc',
-            n_jobs=-1,
-            verbose=0
+            n_jobs=config.get('search_n_jobs', -1),
+            cache=search_cache
         )
+        print(f"CV fits evaluated: {grid_search.n_evaluated}, reused from cache: {grid_search.n_cached}")
         
-        # Fit the model
-        grid_search.fit(X_train_model, y_train)
-        
-        # Get best model
+        # Get best model, mapped back to the true base rate if needed
         best_model = grid_search.best_estimator_
+        if correction == 'shift':
+            best_model = PriorCorrectedClassifier(best_model, keep_rate)
+        elif correction == 'calibrate':
+            best_model = SigmoidCalibratedClassifier(best_model, keep_rate).calibrate(X_calibration, y_calibration)
         
         # Evaluate on test set
         metrics = evaluate_model_performance(best_model, X_test_model, y_test, model_name)
+        metrics['training_time'] = grid_search.refit_time_
         
         # Store results
         trained_models[model_name] = {
             'model': best_model,
             'best_params': grid_search.best_params_,
             'best_cv_score': grid_search.best_score_,
-            'scale_features': config['scale_features']
+            'scale_features': config['scale_features'],
+            'training_time': grid_search.refit_time_,
+            'negative_keep_rate': keep_rate,
+            'prior_correction': correction
         }
         
         model_results[model_name] = metrics
@@ -210,12 +354,54 @@ def train_models_with_tuning(X, y, feature_names):
         print(f"Best CV AUC: {grid_search.best_score_:.4f}")
         print(f"Test AUC: {metrics['auc_score']:.4f}")
         print(f"Test F1: {metrics['f1_score']:.4f}")
+        print(f"Training time (best params): {grid_search.refit_time_:.2f}s")
         print(f"Best params: {grid_search.best_params_}")
     
     return trained_models, model_results, scaler, X_test, y_test
 
-def analyze_feature_importance(trained_models, feature_names):
-    """Analyze feature importance for interpretable models"""
+def compare_downsampling(trained_models, model_results, X, y, scaler):
+    """Refit every model's best parameters on the full training split and
+    compare training time, test AUC and calibration with the downsampled fit
+    """
+    
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    
+    comparison = {}
+    
+    for model_name, model_info in trained_models.items():
+        if model_info['scale_features']:
+            X_train_model, X_test_model = scaler.transform(X_train), scaler.transform(X_test)
+        else:
+            X_train_model, X_test_model = X_train, X_test
+        
+        full_model = clone(base_estimator(model_info['model']))
+        start_time = time.time()
+        full_model.fit(X_train_model, y_train)
+        full_training_time = time.time() - start_time
+        
+        full_proba = full_model.predict_proba(X_test_model)[:, 1]
+        downsampled_proba = model_info['model'].predict_proba(X_test_model)[:, 1]
+        
+        comparison[model_name] = {
+            'full_training_time': full_training_time,
+            'downsampled_training_time': model_info['training_time'],
+            'full_auc': roc_auc_score(y_test, full_proba),
+            'downsampled_auc': model_results[model_name]['auc_score'],
+            'full_mean_proba': float(full_proba.mean()),
+            'downsampled_mean_proba': float(downsampled_proba.mean()),
+            'fraud_rate': float(y_test.mean())
+        }
+    
+    return comparison
+
+def analyze_feature_importance(trained_models, feature_names, X_test=None, y_test=None, scaler=None):
+    """Analyze feature importance for all models
+
+    Models without feature_importances_ or coef_ (SVM, KNN, Naive Bayes)
+    fall back to permutation importance when test data is provided.
+    """
     
     importance_data = {}
     
@@ -248,6 +434,23 @@ def analyze_feature_importance(trained_models, feature_names):
                     reverse=True
                 )[:10]
             }
+        elif X_test is not None and y_test is not None:
+            # Model-agnostic fallback (SVM, KNN, Naive Bayes, ...)
+            X_model = scaler.transform(X_test) if model_info['scale_features'] else X_test
+            permutation_result = compute_permutation_importance(model, X_model, y_test)
+            importance_scores = permutation_result['importances_mean']
+            importance_data[model_name] = {
+                'type': 'permutation',
+                'features': feature_names,
+                'importance': importance_scores.tolist(),
+                'importance_std': permutation_result['importances_std'].tolist(),
+                'n_repeats': permutation_result['n_repeats'].tolist(),
+                'top_features': sorted(
+                    zip(feature_names, importance_scores), 
+                    key=lambda x: x[1], 
+                    reverse=True
+                )[:10]
+            }
     
     return importance_data
 
@@ -324,7 +527,98 @@ def save_model_artifacts(trained_models, model_results, scaler, feature_names, i
     
     return timestamp
 
+def export_tree_model(trained_models, model_results, scaler, feature_names, timestamp, X):
+    """Export the best tree model as flat typed arrays plus a JSON header
+    
+    Every array in the binary file is little-endian and 8-byte aligned at
+    the offset listed in the header, so it can be viewed as a typed array
+    without copying (see lib/model-export.ts). The export is only promoted
+    to model_export_latest if it reproduces the model's probabilities on X.
+    """
+    
+    # The detect-fraud route only builds per-transaction features
+    graph_features = [name for name in feature_names if name.startswith(GRAPH_FEATURE_PREFIXES)]
+    if graph_features:
+        print(f"Not exporting: the detect-fraud route cannot compute account graph features "
+              f"({', '.join(graph_features)}); model_export_latest left unchanged")
+        return None
+    
+    tree_models = [name for name, info in trained_models.items()
+                   if is_explainable(info['model'])]
+    if not tree_models:
+        print("No exportable tree model found")
+        return None
+    
+    model_name = max(tree_models, key=lambda name: model_results[name]['auc_score'])
+    model_info = trained_models[model_name]
+    explainer = TreeExplainer(model_info['model'], feature_names)
+    
+    arrays = {
+        'feature': explainer.feature.astype('<i4'),
+        'threshold': explainer.threshold.astype('<f8'),
+        'left': explainer.left.astype('<i4'),
+        'right': explainer.right.astype('<i4'),
+        'value': explainer.node_values.astype('<f8'),
+        'roots': explainer.roots.astype('<i4')
+    }
+    
+    try:
+        with open('feature_stats.json', 'r') as f:
+            feature_stats = json.load(f)
+    except FileNotFoundError:
+        feature_stats = {}
+    
+    header = {
+        'format_version': 3,
+        'timestamp': timestamp,
+        'model_name': model_name,
+        'model_type': type(unwrap_model(model_info['model'])[0]).__name__,
+        'negative_keep_rate': unwrap_model(model_info['model'])[1],
+        'output': 'log_odds' if explainer.is_log_odds else 'probability',
+        'init_output': explainer.init_output,
+        'n_trees': len(explainer.roots),
+        'max_depth': int(explainer.max_depth),
+        'expected_value': explainer.bias,
+        'feature_names': feature_names,
+        'scale_features': model_info['scale_features'],
+        'scaler': {'mean': scaler.mean_.tolist(), 'scale': scaler.scale_.tolist()},
+        'feature_stats': feature_stats,
+        'risk_factor_labels': RISK_FACTOR_LABELS,
+        'arrays': {}
+    }
+    
+    binary = bytearray()
+    for name, array in arrays.items():
+        binary.extend(b'\0' * (-len(binary) % 8))
+        header['arrays'][name] = {
+            'dtype': {'<i4': 'int32', '<f4': 'float32', '<f8': 'float64'}[array.dtype.str],
+            'offset': len(binary),
+            'length': int(array.size)
+        }
+        binary.extend(array.tobytes())
+    
+    for suffix in [timestamp, 'latest']:
+        if suffix == 'latest' and not verify_export_parity(f'model_export_{timestamp}', model_info['model'], X):
+            print(f"Export of {model_name} failed the parity check; model_export_latest left unchanged")
+            return None
+        with open(f'model_export_{suffix}.bin', 'wb') as f:
+            f.write(binary)
+        with open(f'model_export_{suffix}.json', 'w') as f:
+            json.dump(header, f, indent=2)
+        write_export_fixture(f'model_export_{suffix}', model_info['model'], X)
+    
+    print(f"Exported {model_name} ({len(binary) / 1024:.0f} KB) to model_export_latest.bin/.json")
+    
+    return model_name
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train fraud detection models")
+    parser.add_argument('--negative-ratio', type=float, default=None,
+                        help="Legitimate transactions kept per fraud case in the training split (default: all)")
+    parser.add_argument('--compare-downsampling', action='store_true',
+                        help="Also refit on the full training split and report the time/AUC change")
+    args = parser.parse_args()
+    
     # Load data
     X, y, feature_names = load_data()
     
@@ -334,10 +628,12 @@ if __name__ == "__main__":
         print(f"Class distribution: {np.bincount(y)}")
         
         # Train models with hyperparameter tuning
-        trained_models, model_results, scaler, X_test, y_test = train_models_with_tuning(X, y, feature_names)
+        trained_models, model_results, scaler, X_test, y_test = train_models_with_tuning(
+            X, y, feature_names, negative_ratio=args.negative_ratio
+        )
         
         # Analyze feature importance
-        importance_data = analyze_feature_importance(trained_models, feature_names)
+        importance_data = analyze_feature_importance(trained_models, feature_names, X_test, y_test, scaler)
         
         # Create ensemble model
         ensemble_model, ensemble_components = create_ensemble_model(trained_models, X_test, y_test)
@@ -345,6 +641,17 @@ if __name__ == "__main__":
         # Save all artifacts
         timestamp = save_model_artifacts(trained_models, model_results, scaler, feature_names, importance_data)
         
+        # Save drift reference (feature histograms + best model score distribution)
+        best_model_name = max(model_results.items(), key=lambda x: x[1]['auc_score'])[0]
+        best_model_info = trained_models[best_model_name]
+        X_test_best = scaler.transform(X_test) if best_model_info['scale_features'] else X_test
+        reference_scores = best_model_info['model'].predict_proba(X_test_best)[:, 1]
+        drift_reference = build_drift_reference(X, reference_scores)
+        save_drift_reference(drift_reference, timestamp)
+        
+        # Export the best tree model for in-process scoring in the Next.js routes
+        export_tree_model(trained_models, model_results, scaler, feature_names, timestamp, X)
+        
         print("\n" + "=" * 60)
         print("MODEL TRAINING COMPLETED")
         print("=" * 60)
@@ -374,6 +681,24 @@ if __name__ == "__main__":
                 for feature, score in importance_info['top_features'][:5]:
                     print(f"  {feature}: {score:.4f}")
         
+        if args.negative_ratio and args.compare_downsampling:
+            comparison = compare_downsampling(trained_models, model_results, X, y, scaler)
+            
+            print(f"Negative Downsampling (ratio {args.negative_ratio:g}:1) vs Full Training Split:")
+            print("-" * 50)
+            for model_name, result in comparison.items():
+                speedup = result['full_training_time'] / max(result['downsampled_training_time'], 1e-9)
+                print(f"{model_name}:")
+                print(f"   Training time: {result['full_training_time']:.2f}s -> "
+                      f"{result['downsampled_training_time']:.2f}s ({speedup:.1f}x)")
+                print(f"   AUC: {result['full_auc']:.4f} -> {result['downsampled_auc']:.4f} "
+                      f"({result['downsampled_auc'] - result['full_auc']:+.4f})")
+                print(f"   Mean probability: {result['full_mean_proba']:.4f} -> "
+                      f"{result['downsampled_mean_proba']:.4f} (fraud rate {result['fraud_rate']:.4f})")
+            
+            with open(f'downsampling_comparison_{timestamp}.json', 'w') as f:
+                json.dump(comparison, f, indent=2)
+        
         print(f"\nAll artifacts saved with timestamp: {timestamp}")
         print("Latest versions saved for easy access")
         
@@ -0,0 +1,396 @@
+import pandas as pd
+import numpy as np
+import json
+import time
+import joblib
+import warnings
+import scipy.sparse as sp
+from functools import lru_cache
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.tree import DecisionTreeClassifier
+from sampling import unwrap_model
+
+# Human-readable risk factor for each model feature; contributions of
+# features sharing a label are summed
+RISK_FACTOR_LABELS = {
+    'amount': "High transaction amount",
+    'amount_log': "High transaction amount",
+    'amount_zscore': "High transaction amount",
+    'hour': "Unusual time of day",
+    'is_night': "Unusual time (night hours)",
+    'day_of_week': "Unusual day of week",
+    'is_weekend': "Weekend transaction",
+    'balance_ratio_origin': "High balance utilization",
+    'balance_ratio_dest': "Large amount relative to recipient balance",
+    'is_cross_border': "Cross-border transaction",
+    'is_merchant_dest': "Merchant destination",
+    'user_transaction_count': "Unusual user transaction history",
+    'type_CASH_IN': "Cash-in transaction type",
+    'type_CASH_OUT': "Cash-out transaction type",
+    'type_TRANSFER': "Transfer transaction type",
+    'type_PAYMENT': "Payment transaction type",
+    'type_DEBIT': "Debit transaction type"
+}
+
+SUPPORTED_TREE_MODELS = (RandomForestClassifier, GradientBoostingClassifier, DecisionTreeClassifier)
+
+def is_explainable(model):
+    """
+    Supported tree model, possibly prior-corrected. The correction is a
+    constant log-odds shift, so it can only be folded into boosted models.
+    """
+    model, keep_rate = unwrap_model(model)
+    return isinstance(model, SUPPORTED_TREE_MODELS) and (
+        keep_rate == 1.0 or isinstance(model, GradientBoostingClassifier))
+
+def _tree_node_values(tree, model):
+    """Per-node output of one fitted tree in the model's additive space"""
+    if isinstance(model, GradientBoostingClassifier):
+        return tree.value[:, 0, 0] * model.learning_rate
+
+    # Classifier trees store class weights (or fractions) per node
+    class_values = tree.value[:, 0, :]
+    return class_values[:, 1] / class_values.sum(axis=1)
+
+class TreeExplainer:
+    """
+    Per-feature attributions for sklearn tree models.
+
+    The attributions plus the bias (the cover-weighted expected output) add
+    up exactly to the model output: the fraud probability for Random Forest
+    / Decision Tree, and the log-odds for Gradient Boosting.
+
+    All trees are flattened into shared node arrays once, with leaves turned
+    into self-loops, so one traversal step advances every tree at the same
+    time. By default every split on the decision path attributes the change
+    in node value from parent to child to the split feature (Saabas path
+    contributions), which costs max_depth vectorized steps per transaction.
+
+    With exact=True the path-dependent TreeSHAP values are computed instead
+    (Lundberg et al.). Every leaf's decision path is merged per feature into
+    the interval (lower, upper] that x must fall in to follow the path and
+    the zero fraction z_j (the product of cover ratios along j's splits).
+    With o_j = 1 when x is inside the interval, the leaf adds
+
+        phi_i += v * (o_i - z_i) * integral_0^1 prod_{j != i} (z_j (1-t) + o_j t) dt
+
+    to every path feature i. The integrand is a polynomial of degree < m,
+    so Gauss-Legendre quadrature with ceil(m / 2) nodes is exact. This visits
+    every leaf of every tree for each transaction, so it is meant for
+    offline batches; the leaf paths are built on first use.
+    """
+
+    def __init__(self, model, feature_names):
+        if not is_explainable(model):
+            raise ValueError(f"Unsupported model type: {type(model).__name__}")
+        model, keep_rate = unwrap_model(model)
+
+        self.feature_names = list(feature_names)
+        self.n_features = len(self.feature_names)
+        self.is_log_odds = isinstance(model, GradientBoostingClassifier)
+
+        if isinstance(model, RandomForestClassifier):
+            trees = [estimator.tree_ for estimator in model.estimators_]
+            tree_weight = 1.0 / len(trees)
+        elif isinstance(model, GradientBoostingClassifier):
+            trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+            tree_weight = 1.0
+        else:
+            trees = [model.tree_]
+            tree_weight = 1.0
+
+        features, thresholds, lefts, rights, values, covers, roots = [], [], [], [], [], [], []
+        offset = 0
+
+        for tree in trees:
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            # Leaves point to themselves so traversal can run a fixed number of steps
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            values.append(_tree_node_values(tree, model) * tree_weight)
+            covers.append(tree.weighted_n_node_samples)
+
+            roots.append(offset)
+            offset += n_nodes
+
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        # Left and right child interleaved, indexed by 2 * node + (x > threshold)
+        self._children = np.stack([self.left, self.right], axis=1).ravel()
+        self.roots = np.array(roots, dtype=np.intp)
+        self.max_depth = max(tree.max_depth for tree in trees)
+
+        self.node_values = np.concatenate(values)
+        self.cover = np.concatenate(covers)
+
+        # Boosting refits leaf values after the split, so internal nodes are
+        # reset to the cover-weighted mean of their children (bottom-up); the
+        # root values are then the expected output of every tree
+        levels, frontier = [], self.roots
+        while len(frontier) > 0:
+            frontier = frontier[self.left[frontier] != frontier]
+            levels.append(frontier)
+            frontier = np.concatenate([self.left[frontier], self.right[frontier]])
+        for parents in reversed(levels):
+            left, right = self.left[parents], self.right[parents]
+            self.node_values[parents] = (self.cover[left] * self.node_values[left] +
+                                         self.cover[right] * self.node_values[right]) / self.cover[parents]
+
+        # Constant added to the tree outputs (prior log-odds for boosting)
+        self.init_output = 0.0
+        if self.is_log_odds:
+            x = np.zeros((1, model.n_features_in_))
+            tree_sum = self.node_values[self._leaves(x)[0]].sum()
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                self.init_output = float(model.decision_function(x)[0] - tree_sum)
+            # Prior correction for negative downsampling (sampling.PriorCorrectedClassifier)
+            self.init_output += float(np.log(keep_rate))
+
+        self._leaf_paths_built = False
+        self.bias = self.init_output + float(self.node_values[self.roots].sum())
+
+    def _build_leaf_paths(self):
+        """Merged per-feature path conditions of every leaf, built one depth level at a time"""
+        if self._leaf_paths_built:
+            return
+        cover = self.cover
+        n_nodes = len(self.feature)
+        is_leaf = self.left == np.arange(n_nodes)
+
+        # Per frontier node, dense over features: zero fraction and (lower, upper] interval
+        frontier = self.roots
+        zero = np.ones((len(frontier), self.n_features))
+        lower = np.full((len(frontier), self.n_features), -np.inf)
+        upper = np.full((len(frontier), self.n_features), np.inf)
+        leaf_nodes, leaf_zero, leaf_lower, leaf_upper = [], [], [], []
+
+        while len(frontier) > 0:
+            leaf_mask = is_leaf[frontier]
+            leaf_nodes.append(frontier[leaf_mask])
+            leaf_zero.append(zero[leaf_mask])
+            leaf_lower.append(lower[leaf_mask])
+            leaf_upper.append(upper[leaf_mask])
+
+            parents = frontier[~leaf_mask]
+            zero, lower, upper = zero[~leaf_mask], lower[~leaf_mask], upper[~leaf_mask]
+            rows = np.arange(len(parents))
+            split_feature = self.feature[parents]
+            split_threshold = self.threshold[parents]
+
+            children = []
+            for child, is_left in ((self.left[parents], True), (self.right[parents], False)):
+                child_zero, child_lower, child_upper = zero.copy(), lower.copy(), upper.copy()
+                child_zero[rows, split_feature] *= cover[child] / cover[parents]
+                if is_left:
+                    child_upper[rows, split_feature] = np.minimum(child_upper[rows, split_feature], split_threshold)
+                else:
+                    child_lower[rows, split_feature] = np.maximum(child_lower[rows, split_feature], split_threshold)
+                children.append((child, child_zero, child_lower, child_upper))
+
+            frontier = np.concatenate([c[0] for c in children])
+            zero = np.concatenate([c[1] for c in children])
+            lower = np.concatenate([c[2] for c in children])
+            upper = np.concatenate([c[3] for c in children])
+
+        leaf_nodes = np.concatenate(leaf_nodes)
+        zero = np.concatenate(leaf_zero)
+        lower = np.concatenate(leaf_lower)
+        upper = np.concatenate(leaf_upper)
+
+        # Compact to the features actually on each path (path features first)
+        on_path = np.isfinite(lower) | np.isfinite(upper)
+        self.path_length = on_path.sum(axis=1).astype(np.intp)
+        self.max_path_length = max(int(self.path_length.max()), 1)
+
+        order = np.argsort(~on_path, axis=1, kind='stable')[:, :self.max_path_length]
+        is_padding = np.arange(self.max_path_length) >= self.path_length[:, None]
+        self.path_feature = np.where(is_padding, 0, order).astype(np.intp)
+        # Padding always matches with z = 1, a constant factor of 1 that contributes nothing
+        self.path_zero = np.where(is_padding, 1.0, np.take_along_axis(zero, order, axis=1))
+        self.path_lower = np.where(is_padding, -np.inf, np.take_along_axis(lower, order, axis=1))
+        self.path_upper = np.where(is_padding, np.inf, np.take_along_axis(upper, order, axis=1))
+
+        self.leaf_node = leaf_nodes.astype(np.intp)
+        self.leaf_value = self.node_values[leaf_nodes]
+
+        nodes, weights = np.polynomial.legendre.leggauss((self.max_path_length + 1) // 2)
+        self.quadrature_nodes = (nodes + 1) / 2
+        self.quadrature_weights = weights / 2
+
+        # Scatters the (leaf, path slot) contributions onto features
+        n_slots = self.path_feature.size
+        self._slot_to_feature = sp.csr_matrix(
+            (np.ones(n_slots), (np.arange(n_slots), self.path_feature.ravel())),
+            shape=(n_slots, self.n_features)
+        )
+        self._leaf_paths_built = True
+
+    def _leaves(self, X):
+        """Leaf node reached in every tree, shape (n_samples, n_trees)"""
+        X = np.asarray(X, dtype=np.float32)
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        rows = np.arange(X.shape[0])[:, None]
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return nodes
+
+    def _path_contributions(self, X):
+        """Saabas path contributions for a chunk of float32 rows, shape (n_samples, n_features)"""
+        row_offsets = (np.arange(X.shape[0]) * self.n_features)[:, None]
+        X_flat = X.ravel()
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        parents, children = [], []
+
+        for _ in range(max(self.max_depth, 1)):
+            go_right = X_flat[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+            parents.append(nodes)
+            nodes = self._children[2 * nodes + go_right]
+            children.append(nodes)
+
+        # Leaves are self-loops, so the steps after a tree finishes add zero
+        parents, children = np.stack(parents), np.stack(children)
+        contributions = np.bincount((row_offsets + self.feature[parents]).ravel(),
+                                    weights=(self.node_values[children] - self.node_values[parents]).ravel(),
+                                    minlength=X.shape[0] * self.n_features)
+        return contributions.reshape(X.shape[0], self.n_features)
+
+    def _shap_values(self, X, max_chunk_elements):
+        """Exact TreeSHAP values for a chunk of float32 rows, shape (n_samples, n_features)"""
+        self._build_leaf_paths()
+        n_leaves, max_length = self.path_zero.shape
+        t = self.quadrature_nodes
+        contributions = np.zeros((X.shape[0], self.n_features))
+
+        # Bounds the (samples, leaves, path, quadrature nodes) working array
+        leaf_chunk = max(1, max_chunk_elements // (X.shape[0] * max_length * len(t)))
+        for start in range(0, n_leaves, leaf_chunk):
+            leaves = slice(start, start + leaf_chunk)
+            path_zero = self.path_zero[leaves]
+            x = X[:, self.path_feature[leaves]]
+            one = ((x > self.path_lower[leaves]) & (x <= self.path_upper[leaves])).astype(float)
+
+            # z_j (1-t) + o_j t at every quadrature node
+            factors = path_zero[..., None] * (1 - t) + one[..., None] * t
+            products = factors.prod(axis=2, keepdims=True) * self.quadrature_weights
+            integrals = (products / factors).sum(axis=-1)
+
+            slot_contributions = self.leaf_value[leaves, None] * (one - path_zero) * integrals
+            slot_to_feature = self._slot_to_feature[start * max_length:(start + path_zero.shape[0]) * max_length]
+            contributions += np.asarray(slot_to_feature.T @ slot_contributions.reshape(X.shape[0], -1).T).T
+
+        return contributions
+
+    def explain(self, x, exact=False, max_chunk_elements=1000000):
+        """Attributions for a single transaction: (bias, contributions, output)"""
+        X = np.asarray(x, dtype=np.float32).reshape(1, -1)
+        contributions = self._shap_values(X, max_chunk_elements)[0] if exact else self._path_contributions(X)[0]
+        output = self.bias + contributions.sum()
+        return self.bias, contributions, self._probability(output)
+
+    def explain_batch(self, X, exact=False, max_chunk_elements=1000000):
+        """Vectorized attributions for many transactions, shape (n_samples, n_features)"""
+        X = np.asarray(X, dtype=np.float32)
+        contributions = np.zeros((X.shape[0], self.n_features))
+
+        # Bounds the (steps, samples, trees) path arrays, or the exact mode's
+        # (samples, leaves, path, quadrature nodes) working array
+        if exact:
+            self._build_leaf_paths()
+            chunk_size = max(1, max_chunk_elements // self.path_zero.size // len(self.quadrature_nodes))
+        else:
+            chunk_size = max(1, max_chunk_elements // len(self.roots) // max(self.max_depth, 1))
+
+        for start in range(0, X.shape[0], chunk_size):
+            chunk = X[start:start + chunk_size]
+            contributions[start:start + chunk_size] = (
+                self._shap_values(chunk, max_chunk_elements) if exact else self._path_contributions(chunk))
+
+        probabilities = self._probability(self.bias + contributions.sum(axis=1))
+        return self.bias, contributions, probabilities
+
+    def _probability(self, output):
+        if self.is_log_odds:
+            return 1.0 / (1.0 + np.exp(-output))
+        return output
+
+    def risk_factors(self, contributions, max_factors=5, min_contribution=0.01):
+        """Map per-feature contributions to human-readable risk factors"""
+        factor_scores = {}
+
+        for feature, contribution in zip(self.feature_names, contributions):
+            label = RISK_FACTOR_LABELS.get(feature, feature)
+            factor_scores[label] = factor_scores.get(label, 0.0) + float(contribution)
+
+        factors = [(label, score) for label, score in factor_scores.items() if score >= min_contribution]
+        return sorted(factors, key=lambda x: x[1], reverse=True)[:max_factors]
+
+@lru_cache(maxsize=None)
+def load_explainer(model_name=None, models_path='trained_models_latest.pkl'):
+    """
+    Build (once per process) the explainer for a saved tree model. Defaults
+    to the best model if it is a tree model, otherwise the best-scoring
+    supported tree model.
+    """
+    trained_models = joblib.load(models_path)
+
+    with open('model_metadata_latest.json', 'r') as f:
+        metadata = json.load(f)
+
+    if model_name is None:
+        supported = [name for name, info in trained_models.items()
+                     if is_explainable(info['model'])]
+        if metadata['best_model'] in supported:
+            model_name = metadata['best_model']
+        elif supported:
+            model_name = max(supported, key=lambda name: trained_models[name].get('best_cv_score', 0))
+        else:
+            raise ValueError("No supported tree model found in trained models")
+
+    return TreeExplainer(trained_models[model_name]['model'], metadata['feature_names'])
+
+if __name__ == "__main__":
+    try:
+        X = pd.read_csv('features.csv').astype(float)
+        explainer = load_explainer()
+    except FileNotFoundError:
+        print("Model files not found. Please run train_ml_models.py first.")
+        explainer = None
+
+    if explainer is not None:
+        x = X.values[0]
+        explainer.explain(x)
+
+        n_runs = 1000
+        start_time = time.perf_counter()
+        for _ in range(n_runs):
+            bias, contributions, probability = explainer.explain(x)
+        single_ms = (time.perf_counter() - start_time) / n_runs * 1000
+
+        start_time = time.perf_counter()
+        explainer.explain_batch(X.values)
+        batch_ms = (time.perf_counter() - start_time) / len(X) * 1000
+
+        # Exact TreeSHAP visits every leaf, so time it on a small sample
+        sample = X.values[:100]
+        start_time = time.perf_counter()
+        explainer.explain_batch(sample, exact=True)
+        exact_ms = (time.perf_counter() - start_time) / len(sample) * 1000
+
+        print(f"Single transaction: {single_ms:.3f} ms")
+        print(f"Batch: {batch_ms:.4f} ms per transaction")
+        print(f"Exact TreeSHAP batch: {exact_ms:.3f} ms per transaction")
+        print(f"\nFraud probability: {probability:.4f} (bias {bias:.4f})")
+        print("Risk factors:")
+        for label, score in explainer.risk_factors(contributions):
+            print(f"  {label}: {score:+.4f}")
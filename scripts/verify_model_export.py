@@ -0,0 +1,105 @@
+import pandas as pd
+import numpy as np
+import json
+import sys
+import joblib
+from tree_explainer import TreeExplainer
+
+def load_model_export(prefix='model_export_latest'):
+    """Load an exported model: JSON header plus typed views into the binary file"""
+    with open(f'{prefix}.json', 'r') as f:
+        header = json.load(f)
+
+    with open(f'{prefix}.bin', 'rb') as f:
+        binary = f.read()
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = {'int32': '<i4', 'float32': '<f4', 'float64': '<f8'}[spec['dtype']]
+        arrays[name] = np.frombuffer(binary, dtype=dtype, count=spec['length'], offset=spec['offset'])
+
+    return header, arrays
+
+def score_exported_model(header, arrays, X):
+    """
+    Score rows with the exported arrays only, following the same steps as
+    lib/model-export.ts: float32 feature values compared against float64
+    thresholds, every tree advanced max_depth steps, leaf values summed.
+    """
+    X = np.asarray(X, dtype=float)
+    if header['scale_features']:
+        X = (X - np.array(header['scaler']['mean'])) / np.array(header['scaler']['scale'])
+    X = X.astype(np.float32)
+
+    feature = arrays['feature']
+    threshold = arrays['threshold']
+    left = arrays['left']
+    right = arrays['right']
+
+    nodes = np.broadcast_to(arrays['roots'], (X.shape[0], len(arrays['roots']))).copy()
+    rows = np.arange(X.shape[0])[:, None]
+
+    for _ in range(header['max_depth']):
+        go_left = X[rows, feature[nodes]] <= threshold[nodes]
+        nodes = np.where(go_left, left[nodes], right[nodes])
+
+    output = header['init_output'] + arrays['value'][nodes].sum(axis=1)
+
+    if header['output'] == 'log_odds':
+        return 1.0 / (1.0 + np.exp(-output))
+    return output
+
+def verify_export_parity(prefix, model, X, tolerance=1e-9, chunk_size=10000):
+    """Check that the exported model reproduces sklearn's predict_proba"""
+    header, arrays = load_model_export(prefix)
+
+    X = X[header['feature_names']].astype(float)
+    max_error = 0.0
+
+    # Scored in chunks so the (rows, trees) node arrays stay small
+    for start in range(0, len(X), chunk_size):
+        chunk = X.iloc[start:start + chunk_size]
+        expected = model.predict_proba(chunk)[:, 1]
+        actual = score_exported_model(header, arrays, chunk.values)
+        max_error = max(max_error, float(np.max(np.abs(expected - actual))))
+
+    passed = max_error <= tolerance
+
+    print(f"Export parity ({header['model_name']}, {len(X)} rows): "
+          f"max abs error {max_error:.2e} -> {'PASS' if passed else 'FAIL'}")
+
+    return passed
+
+def write_export_fixture(prefix, model, X, n_rows=100):
+    """
+    Store fixture rows with sklearn's probabilities and the path
+    contributions next to the export, for scripts/check-model-export.mts
+    """
+    header, _ = load_model_export(prefix)
+
+    X = X[header['feature_names']].astype(float).iloc[:n_rows]
+    X_model = X.values
+    if header['scale_features']:
+        X_model = (X_model - np.array(header['scaler']['mean'])) / np.array(header['scaler']['scale'])
+    _, contributions, _ = TreeExplainer(model, header['feature_names']).explain_batch(X_model)
+
+    fixture = {
+        'rows': X.to_dict('records'),
+        'probabilities': model.predict_proba(X)[:, 1].tolist(),
+        'contributions': contributions.tolist()
+    }
+
+    with open(f'{prefix}_fixture.json', 'w') as f:
+        json.dump(fixture, f)
+
+if __name__ == "__main__":
+    try:
+        X = pd.read_csv('features.csv')
+        header, _ = load_model_export('model_export_latest')
+        trained_models = joblib.load('trained_models_latest.pkl')
+    except FileNotFoundError:
+        print("Exported model not found. Please run train_ml_models.py first.")
+        sys.exit(1)
+
+    model = trained_models[header['model_name']]['model']
+    sys.exit(0 if verify_export_parity('model_export_latest', model, X) else 1)